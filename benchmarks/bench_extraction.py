@@ -0,0 +1,130 @@
+"""
+Benchmark de vazão da extração CartPanda contra a API simulada local.
+
+Executa `fetch_orders_for_slug` e `fetch_customers_for_slug` dos data loaders
+contra `benchmarks/cartpanda_mock_server.py` e reporta páginas/s, registros/s e
+latência p50/p99 por página (medida no cliente, incluindo espera do rate
+limiter e retentativas).
+
+    python benchmarks/bench_extraction.py --orders-per-shop 10000 --latency-ms 100 --rate 50
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cartpanda_mock_server import DEFAULT_SLUGS, MockCartPandaAPI, MockServerThread
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def instrument_page_latency(latencies):
+    """
+    Envolve `CartPandaClient.fetch_page` para registrar a latência de cada página
+    """
+    from utils.cartpanda_client import CartPandaClient
+
+    original = CartPandaClient.fetch_page
+
+    async def timed_fetch_page(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await original(self, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    CartPandaClient.fetch_page = timed_fetch_page
+    return lambda: setattr(CartPandaClient, 'fetch_page', original)
+
+
+def run_case(name, fetch, slugs, latencies):
+    latencies.clear()
+    started = time.perf_counter()
+    total_records = 0
+    for slug in slugs:
+        total_records += len(fetch(slug))
+    elapsed = time.perf_counter() - started
+
+    pages = len(latencies)
+    return {
+        'case': name,
+        'seconds': elapsed,
+        'pages': pages,
+        'records': total_records,
+        'pages_per_s': pages / elapsed if elapsed else 0.0,
+        'records_per_s': total_records / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def print_report(results, api):
+    print(f"\n{'caso':<12}{'tempo (s)':>11}{'páginas':>9}{'registros':>11}"
+          f"{'pág/s':>9}{'reg/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for r in results:
+        print(f"{r['case']:<12}{r['seconds']:>11.2f}{r['pages']:>9}{r['records']:>11}"
+              f"{r['pages_per_s']:>9.1f}{r['records_per_s']:>10.0f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+    print(f"\nRequisições no servidor: {api.stats['requests']} (429: {api.stats['throttled']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da extração CartPanda')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--shops', type=int, default=len(DEFAULT_SLUGS))
+    parser.add_argument('--orders-per-shop', type=int, default=5000)
+    parser.add_argument('--customers-per-shop', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate', type=float, default=20.0, help='limite do rate limiter (req/s)')
+    parser.add_argument('--per-shop-concurrency', type=int, default=None, help='limite por loja (padrão: sem limite)')
+    parser.add_argument('--updated-at-min', default=None, help='filtro incremental dos pedidos')
+    args = parser.parse_args(argv)
+
+    slugs = DEFAULT_SLUGS[:args.shops]
+    api = MockCartPandaAPI(
+        slugs=slugs, orders_per_shop=args.orders_per_shop, customers_per_shop=args.customers_per_shop,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429,
+    )
+
+    with MockServerThread(api, port=args.port) as server:
+        # Precisa estar definido antes de importar o cliente
+        os.environ['CARTPANDA_BASE_URL'] = server.base_url
+
+        from data_loaders.extrai_clientes_cartpanda import fetch_customers_for_slug
+        from data_loaders.incremental_orders_cartpanda import fetch_orders_for_slug
+        from utils.rate_limiter import get_rate_limiter_for_headers
+
+        headers = {'Authorization': 'Bearer benchmark', 'Accept': 'application/json'}
+        rate_limiter = get_rate_limiter_for_headers(headers, rate=args.rate, burst=max(args.rate, 1))
+
+        latencies = []
+        restore = instrument_page_latency(latencies)
+        try:
+            results = [
+                run_case('orders', lambda slug: fetch_orders_for_slug(
+                    slug, headers, args.updated_at_min, per_shop_concurrency=args.per_shop_concurrency,
+                ), slugs, latencies),
+                run_case('customers', lambda slug: fetch_customers_for_slug(
+                    slug, headers, rate_limiter,
+                ), slugs, latencies),
+            ]
+        finally:
+            restore()
+
+    print_report(results, api)
+    return results
+
+
+if __name__ == '__main__':
+    main()
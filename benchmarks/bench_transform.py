@@ -0,0 +1,101 @@
+"""
+Benchmark da montagem das colunas de pedidos: `pd.json_normalize` + filtro de
+`ORDER_FIELDS` contra o extrator compilado (`utils.field_extractor`).
+
+Os pedidos vêm do gerador da API simulada (`cartpanda_mock_server.make_order`);
+para caber em memória nos tamanhos grandes, um conjunto de pedidos distintos é
+repetido até o tamanho pedido. Reporta tempo (melhor de `--repeat`) e pico de
+memória alocada (tracemalloc, numa execução separada).
+
+    python benchmarks/bench_transform.py --sizes 10000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from cartpanda_mock_server import DEFAULT_SLUGS, make_order
+from utils.cartpanda_transform import ORDER_EXTRACTOR, ORDER_FIELDS
+
+
+def make_orders(size, unique=5000, seed=42):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    pool = []
+    for n in range(min(size, unique)):
+        slug = DEFAULT_SLUGS[n % len(DEFAULT_SLUGS)]
+        order = make_order(rng, slug, n, now - timedelta(seconds=rng.randint(0, 30 * 86400)))
+        order['shop_slug'] = slug
+        pool.append(order)
+    return [pool[n % len(pool)] for n in range(size)]
+
+
+def json_normalize_columns(orders):
+    df = pd.json_normalize(orders, sep='.')
+    return df[[col for col in ORDER_FIELDS if col in df.columns]]
+
+
+def extractor_columns(orders):
+    return ORDER_EXTRACTOR.to_frame(orders)
+
+
+CASES = [
+    ('json_normalize', json_normalize_columns),
+    ('extractor', extractor_columns),
+]
+
+
+def measure(fn, orders, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn(orders)
+        best = min(best, time.perf_counter() - started)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn(orders)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    shape = result.shape
+    del result
+    return best, peak, shape
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da extração de colunas de pedidos')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--unique', type=int, default=5000, help='pedidos distintos no conjunto repetido')
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes:
+        orders = make_orders(size, unique=args.unique)
+        for name, fn in CASES:
+            seconds, peak, shape = measure(fn, orders, args.repeat)
+            rows.append((size, name, seconds, peak, shape))
+            print(f"  {size:>9} {name:<15} {seconds:8.2f}s  pico {peak / 1024 / 1024:9.1f} MB  {shape}")
+        del orders
+        gc.collect()
+
+    print(f"\n{'pedidos':>9}  {'caso':<15}{'tempo (s)':>10}{'pico (MB)':>11}{'colunas':>9}")
+    for size, name, seconds, peak, shape in rows:
+        print(f"{size:>9}  {name:<15}{seconds:>10.2f}{peak / 1024 / 1024:>11.1f}{shape[1]:>9}")
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+Servidor local que imita a API CartPanda para medir a extração sem tocar produção.
+
+Implementa `GET /api/v3/{slug}/orders` e `GET /api/v3/{slug}/customers` com:
+- paginação `page`/`limit` e envelope `meta.current_page`/`meta.last_page`
+- filtro `updated_at_min`
+- latência configurável (média + jitter)
+- injeção de 429 com `Retry-After`
+- tamanho do dataset por loja
+
+Uso standalone:
+
+    python benchmarks/cartpanda_mock_server.py --port 8090 --orders-per-shop 20000
+    export CARTPANDA_BASE_URL=http://127.0.0.1:8090/api/v3
+"""
+import argparse
+import asyncio
+import random
+import threading
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+DEFAULT_SLUGS = ['vita-waves', 'nutra-force-wl', 'nutra-force-di', 'nutra-force', 'vita-labs']
+
+
+def _timestamp(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def make_order(rng, slug, order_id, updated_at):
+    created_at = updated_at - timedelta(hours=rng.randint(0, 72))
+    items = []
+    for n in range(rng.randint(1, 4)):
+        price = round(rng.uniform(20, 400), 2)
+        quantity = rng.randint(1, 3)
+        items.append({
+            'id': order_id * 10 + n,
+            'name': f'Produto {rng.randint(1, 50)}',
+            'title': f'Produto {rng.randint(1, 50)}',
+            'price': f'{price:.2f}',
+            'local_currency_item_total_price': f'{price * quantity:.2f}',
+            'quantity': quantity,
+            'sku': f'SKU-{rng.randint(1000, 9999)}',
+            'vendor': slug,
+            'currency_symbol': 'R$',
+            'total_price': f'{price * quantity:.2f}',
+            'product_main_image': f'https://cdn.example.com/{rng.randint(1, 50)}.png',
+            'tax_lines': [{'price': '0.00', 'rate': 0, 'title': 'ICMS'}],
+        })
+
+    total = sum(float(item['total_price']) for item in items)
+    money_set = {
+        'shop_money': {'amount': f'{total:.2f}', 'currency_code': 'BRL'},
+        'presentment_money': {'amount': f'{total:.2f}', 'currency_code': 'BRL'},
+    }
+    discount_codes = []
+    if rng.random() < 0.3:
+        discount = round(total * 0.1, 2)
+        # A API devolve valores com vírgula ou ponto decimal
+        amount = f'{discount:.2f}'.replace('.', ',') if rng.random() < 0.5 else f'{discount:.2f}'
+        discount_codes.append({'code': 'PROMO10', 'local_currency_discount_amount': amount})
+
+    return {
+        'id': order_id,
+        'status_id': rng.choice([1, 2, 3]),
+        'browser_ip': f'10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}',
+        'buyer_accepts_marketing': rng.random() < 0.5,
+        'cancel_reason': None,
+        'cancelled_at': None,
+        'client_details': {'browser_ip': '10.0.0.1', 'user_agent': 'Mozilla/5.0', 'accept_language': 'pt-BR'},
+        'contact_email': f'cliente{order_id}@example.com',
+        'created_at': _timestamp(created_at),
+        'updated_at': _timestamp(updated_at),
+        'currency': 'BRL',
+        'currency_symbol': 'R$',
+        'current_total_price': f'{total:.2f}',
+        'current_total_price_set': money_set,
+        'total_price': f'{total:.2f}',
+        'total_price_set': money_set,
+        'subtotal_price': f'{total:.2f}',
+        'subtotal_price_set': money_set,
+        'total_discounts': '0.00',
+        'total_tax': '0.00',
+        'total_weight': rng.randint(100, 3000),
+        'email': f'cliente{order_id}@example.com',
+        'financial_status': rng.choice(['paid', 'pending', 'refunded']),
+        'fulfillment_status': rng.choice([None, 'fulfilled', 'partial']),
+        'name': f'#{order_id}',
+        'number': order_id,
+        'order_number': order_id,
+        'note_attributes': [],
+        'payment': {'gateway': rng.choice(['pagarme', 'mercadopago']), 'payment_type': rng.choice(['pix', 'credit_card'])},
+        'tags': '',
+        'tax_lines': [{'price': '0.00', 'rate': 0, 'title': 'ICMS'}],
+        'taxes_included': False,
+        'test': False,
+        'customer': {'id': order_id + 5_000_000, 'first_name': 'Cliente', 'last_name': str(order_id)},
+        'shipping_address': {
+            'country': 'Brazil', 'house_no': str(rng.randint(1, 999)), 'address': 'Rua Exemplo',
+            'province_code': 'SP', 'zip': f'0{rng.randint(1000000, 9999999)}', 'country_code': 'BR',
+            'city': 'São Paulo', 'neighborhood': 'Centro', 'phone': '11999999999',
+        },
+        'shipping_lines': {'local_currency_shipping_price': f'{rng.uniform(0, 40):.2f}'},
+        'discount_codes': discount_codes,
+        'line_items': items,
+    }
+
+
+def make_customer(rng, slug, customer_id, updated_at):
+    return {
+        'id': customer_id,
+        'email': f'cliente{customer_id}@example.com',
+        'first_name': 'Cliente',
+        'last_name': str(customer_id),
+        'shop_id': zlib.crc32(slug.encode()) % 100000,
+        'created_at': _timestamp(updated_at - timedelta(days=rng.randint(0, 30))),
+        'updated_at': _timestamp(updated_at),
+        'default_address': {'country': 'Brazil', 'city': 'São Paulo', 'zip': '01000000', 'province': 'SP'},
+        'address': [{
+            'id': customer_id * 10, 'first_name': 'Cliente', 'last_name': str(customer_id),
+            'address1': 'Rua Exemplo', 'city': 'São Paulo', 'province': 'SP', 'country': 'Brazil',
+            'zip': '01000000', 'phone': '11999999999', 'province_code': 'SP', 'country_code': 'BR',
+            'default': True,
+        }],
+    }
+
+
+class MockCartPandaAPI:
+    """
+    Dataset sintético determinístico (por `seed`) e servidor aiohttp
+    """
+
+    def __init__(self, slugs=None, orders_per_shop=5000, customers_per_shop=2000,
+                 latency_ms=80, jitter_ms=40, rate_429=0.0, retry_after=1, days=30, seed=42):
+        self.slugs = slugs or DEFAULT_SLUGS
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'throttled': 0}
+        self.data = {'orders': {}, 'customers': {}}
+
+        now = datetime.now(timezone.utc)
+        for shop_index, slug in enumerate(self.slugs):
+            data_rng = random.Random(f'{seed}-{slug}')
+            base_id = (shop_index + 1) * 10_000_000
+            for endpoint, size, factory in (
+                ('orders', orders_per_shop, make_order),
+                ('customers', customers_per_shop, make_customer),
+            ):
+                records = [
+                    factory(data_rng, slug, base_id + n, now - timedelta(seconds=data_rng.randint(0, days * 86400)))
+                    for n in range(size)
+                ]
+                # Mais recentes primeiro, como a API
+                records.sort(key=lambda record: record['updated_at'], reverse=True)
+                self.data[endpoint][slug] = records
+
+    async def handle(self, request):
+        self.stats['requests'] += 1
+        delay = max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        if self.rate_429 and self.rng.random() < self.rate_429:
+            self.stats['throttled'] += 1
+            return web.json_response(
+                {'message': 'Too Many Attempts.'}, status=429,
+                headers={'Retry-After': str(self.retry_after)},
+            )
+
+        slug = request.match_info['slug']
+        endpoint = request.match_info['endpoint']
+        records = self.data[endpoint].get(slug)
+        if records is None:
+            return web.json_response({'message': 'Shop not found'}, status=404)
+
+        updated_at_min = request.query.get('updated_at_min')
+        if updated_at_min:
+            records = [record for record in records if record['updated_at'] >= updated_at_min]
+
+        page = max(int(request.query.get('page', 1)), 1)
+        limit = min(max(int(request.query.get('limit', 20)), 1), 200)
+        last_page = max((len(records) + limit - 1) // limit, 1)
+        start = (page - 1) * limit
+
+        return web.json_response({
+            endpoint: records[start:start + limit],
+            'meta': {
+                'current_page': page,
+                'last_page': last_page,
+                'per_page': limit,
+                'total': len(records),
+            },
+        })
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get('/api/v3/{slug}/{endpoint:orders|customers}', self.handle)
+        return app
+
+
+class MockServerThread:
+    """
+    Sobe o servidor numa thread com event loop próprio (para benchmarks síncronos)
+
+        with MockServerThread(api, port=8090) as server:
+            os.environ['CARTPANDA_BASE_URL'] = server.base_url
+    """
+
+    def __init__(self, api, host='127.0.0.1', port=8090):
+        self.api = api
+        self.host = host
+        self.port = port
+        self.base_url = f'http://{host}:{port}/api/v3'
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._runner = None
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.api.make_app())
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+
+    def __enter__(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='API CartPanda simulada')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--orders-per-shop', type=int, default=5000)
+    parser.add_argument('--customers-per-shop', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fração de respostas 429 (0-1)')
+    parser.add_argument('--retry-after', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    api = MockCartPandaAPI(
+        orders_per_shop=args.orders_per_shop, customers_per_shop=args.customers_per_shop,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429,
+        retry_after=args.retry_after, seed=args.seed,
+    )
+    print(f"🧪 API CartPanda simulada em http://{args.host}:{args.port}/api/v3")
+    web.run_app(api.make_app(), host=args.host, port=args.port)
@@ -1,7 +1,15 @@
-from sqlalchemy import create_engine
-from mage_ai.data_preparation.shared.secrets import get_secret_value
-import pandas as pd
-import json
+from utils.postgres import (
+    add_missing_columns,
+    create_replication_engine,
+    json_column_types,
+    sanitize_for_postgres,
+    upsert_dataframe,
+)
+from utils.sync_state import compute_high_water_marks, save_high_water_marks
+
+# Mesma fonte/chave lidas pelo loader movidesk_tickets_extraction
+STATE_SOURCE = 'movidesk_tickets'
+STATE_KEY = 'tickets'
 
 if 'data_exporter' not in globals():
     from mage_ai.data_preparation.decorators import data_exporter
@@ -10,33 +18,36 @@ if 'data_exporter' not in globals():
 @data_exporter
 def export_data(data, *args, **kwargs):
     """
-    Exporta os dados do bloco anterior para um banco PostgreSQL usando segredos do Mage.
-    Serializa colunas do tipo dict ou list como strings JSON.
+    Exporta os tickets do bloco anterior para o PostgreSQL com upsert por id
+    (a extração é incremental: só chegam os tickets alterados).
+    Colunas com dict ou list são gravadas como JSONB.
     """
 
-    # Captura das variáveis seguras definidas nos Secrets
-    POSTGRES_HOST = get_secret_value('POSTGRES_HOST')
-    POSTGRES_PORT = get_secret_value('DB_PORT') 
-    POSTGRES_DB   = get_secret_value('DB_NAME') 
-    POSTGRES_USER = get_secret_value('DB_USER') 
-    POSTGRES_PASS = get_secret_value('DB_PASSWORD') 
-
+    SCHEMA = 'public'
     TABLE_NAME = 'tickets_movidesk'
 
-    # Constrói a connection string
-    connection_string = (
-        f'postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASS}'
-        f'@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
-    )
-    engine = create_engine(connection_string)
+    if data.empty:
+        print(f"ℹ️  Nenhum ticket alterado - nada a exportar para '{TABLE_NAME}'.")
+        return f"0 registros exportados para a tabela '{TABLE_NAME}'."
+
+    engine = create_replication_engine()
+
+    # 🔧 Converte colunas com dict ou list para JSON (gravadas como JSONB)
+    column_types = json_column_types(data)
+    data = sanitize_for_postgres(data, column_types)
+
+    data = data.drop_duplicates(subset=['id'], keep='last')
 
-    # 🔧 Converte colunas com dict ou list para JSON string
-    for col in data.columns:
-        if data[col].apply(lambda x: isinstance(x, (dict, list))).any():
-            data[col] = data[col].apply(lambda x: json.dumps(x) if isinstance(x, (dict, list)) else x)
+    # Upsert por id (colunas novas são adicionadas à tabela existente)
+    add_missing_columns(engine, data, TABLE_NAME, SCHEMA, column_types)
+    upsert_dataframe(data, TABLE_NAME, SCHEMA, engine, 'id', column_types)
 
-    # Exporta para PostgreSQL
-    data.to_sql(TABLE_NAME, engine, if_exists='replace', index=False)
+    # Avança o high-water mark (maior lastUpdate exportado) só após o upsert
+    if 'lastUpdate' in data.columns:
+        marks = compute_high_water_marks(data.assign(state_key=STATE_KEY), 'state_key', 'lastUpdate')
+        save_high_water_marks(engine, STATE_SOURCE, marks)
+        for key, mark in marks.items():
+            print(f"🔖 High-water mark de {key}: {mark.isoformat()}")
 
     print(f"✅ Dados exportados com sucesso para a tabela '{TABLE_NAME}'.")
-    return f"{len(data)} registros exportados para a tabela '{TABLE_NAME}'."
\ No newline at end of file
+    return f"{len(data)} registros exportados para a tabela '{TABLE_NAME}'."
@@ -1,56 +1,54 @@
-from mage_ai.data_preparation.shared.secrets import get_secret_value
-from sqlalchemy import create_engine, text
+from utils.postgres import (
+    add_missing_columns,
+    create_replication_engine,
+    ensure_schema,
+    json_column_types,
+    sanitize_for_postgres,
+    upsert_dataframe,
+)
+from utils.sync_state import compute_high_water_marks, save_high_water_marks
+
+# Mesma fonte lida pelo loader extrai_clientes_cartpanda
+STATE_SOURCE = 'cartpanda_customers'
+SCHEMA = 'integracao'
 
 if 'data_exporter' not in globals():
     from mage_ai.data_preparation.decorators import data_exporter
 
-def sanitize_for_postgres(df):
-    for col in df.columns:
-        if df[col].apply(lambda x: isinstance(x, (dict, list))).any():
-            df[col] = df[col].apply(lambda x: str(x) if isinstance(x, (dict, list)) else x)
-    return df
-
 @data_exporter
 def export_cartpanda_customers_data(data, *args, **kwargs):
-    df_customers = sanitize_for_postgres(data['customers_df'])
-    df_addresses = sanitize_for_postgres(data['addresses_df'])
+    # Colunas aninhadas seguem como JSON → JSONB
+    customer_types = json_column_types(data['customers_df'])
+    address_types = json_column_types(data['addresses_df'])
+    df_customers = sanitize_for_postgres(data['customers_df'], customer_types)
+    df_addresses = sanitize_for_postgres(data['addresses_df'], address_types)
 
-    POSTGRES_HOST = get_secret_value('POSTGRES_HOST')
-    POSTGRES_PORT = get_secret_value('DB_PORT')
-    POSTGRES_DB   = get_secret_value('DB_NAME')
-    POSTGRES_USER = get_secret_value('DB_USER')
-    POSTGRES_PASS = get_secret_value('DB_PASSWORD')
+    if df_customers.empty:
+        print('ℹ️  Nenhum cliente novo/atualizado - nada a exportar')
+        return
 
     # Conexão com VPS Hostinger
-    connection_string = (
-        f'postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASS}'
-        f'@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
-    )
-
-    engine = create_engine(connection_string)
+    engine = create_replication_engine()
 
     # Garante a existência do schema "integracao"
-    with engine.begin() as conn:
-        conn.execute(text("CREATE SCHEMA IF NOT EXISTS integracao"))
-
-    # Exporta clientes
-    df_customers.to_sql(
-        schema='integracao',
-        name='cartpanda_customers',
-        con=engine,
-        if_exists='replace',
-        index=False
-    )
-
-    # Exporta endereços
-    df_addresses.to_sql(
-        schema='integracao',
-        name='cartpanda_addresses',
-        con=engine,
-        if_exists='replace',
-        index=False
-    )
+    ensure_schema(engine, SCHEMA)
+
+    # Upsert de clientes por id (extração incremental traz só os atualizados)
+    add_missing_columns(engine, df_customers, 'cartpanda_customers', SCHEMA, customer_types)
+    upsert_dataframe(df_customers, 'cartpanda_customers', SCHEMA, engine, 'id', customer_types)
+
+    # Upsert de endereços por address_id
+    if not df_addresses.empty:
+        df_addresses = df_addresses.dropna(subset=['address_id']).drop_duplicates(subset=['address_id'])
+        add_missing_columns(engine, df_addresses, 'cartpanda_addresses', SCHEMA, address_types)
+    upsert_dataframe(df_addresses, 'cartpanda_addresses', SCHEMA, engine, 'address_id', address_types)
+
+    # Avança o high-water mark por loja só depois dos dois upserts concluídos
+    high_water_marks = compute_high_water_marks(df_customers, 'shop_slug', 'updated_at')
+    save_high_water_marks(engine, STATE_SOURCE, high_water_marks)
+    for slug, mark in high_water_marks.items():
+        print(f"🔖 High-water mark de {slug}: {mark.isoformat()}")
 
     print('👥 Dados de Clientes Exportados Para VPS (PostgreSQL Hostinger)')
     print(f'📊 Clientes: {len(df_customers)} registros')
-    print(f'📍 Endereços: {len(df_addresses)} registros')
\ No newline at end of file
+    print(f'📍 Endereços: {len(df_addresses)} registros')
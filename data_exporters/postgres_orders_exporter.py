@@ -1,15 +1,12 @@
 from mage_ai.data_preparation.shared.secrets import get_secret_value
 from sqlalchemy import create_engine, text
 
+from utils.cartpanda_transform import ITEM_TABLE_TYPES, ORDER_TABLE_TYPES
+from utils.postgres import json_column_types, sanitize_for_postgres, to_sql_dtypes
+
 if 'data_exporter' not in globals():
     from mage_ai.data_preparation.decorators import data_exporter
 
-def sanitize_for_postgres(df):
-    for col in df.columns:
-        if df[col].apply(lambda x: isinstance(x, (dict, list))).any():
-            df[col] = df[col].apply(lambda x: str(x) if isinstance(x, (dict, list)) else x)
-    return df
-
 def add_primary_keys(engine, schema_name):
     """Adiciona chaves primárias nas tabelas após a criação"""
     with engine.begin() as conn:
@@ -35,8 +32,17 @@ def add_primary_keys(engine, schema_name):
 
 @data_exporter
 def export_cartpanda_data(data, *args, **kwargs):
-    df_orders = sanitize_for_postgres(data['orders_df'])
-    df_items = sanitize_for_postgres(data['items_df'])
+    # Modo streaming: os lotes já foram exportados via upsert pelo loader.
+    # Não pode seguir para o `if_exists='replace'` abaixo, que apagaria as tabelas.
+    if 'execution_metadata' in data:
+        print(f"ℹ️  {data['execution_metadata']['message']}")
+        return
+
+    # Colunas aninhadas (declaradas ou detectadas) seguem como JSON → JSONB
+    order_types = json_column_types(data['orders_df'], ORDER_TABLE_TYPES)
+    item_types = json_column_types(data['items_df'], ITEM_TABLE_TYPES)
+    df_orders = sanitize_for_postgres(data['orders_df'], order_types)
+    df_items = sanitize_for_postgres(data['items_df'], item_types)
 
     # POSTGRES_HOST = get_secret_value('POSTGRES_HOST')
     # POSTGRES_PORT = get_secret_value('DB_PORT')
@@ -101,7 +107,8 @@ def export_cartpanda_data(data, *args, **kwargs):
         name='cartpanda_orders',
         con=engine_railway,
         if_exists='replace',
-        index=False
+        index=False,
+        dtype=to_sql_dtypes(df_orders, order_types),
     )
 
     # Exporta itens
@@ -110,7 +117,8 @@ def export_cartpanda_data(data, *args, **kwargs):
         name='cartpanda_items',
         con=engine_railway,
         if_exists='replace',
-        index=False
+        index=False,
+        dtype=to_sql_dtypes(df_items, item_types),
     )
 
     # Adiciona as chaves primárias no Railway também
@@ -1,125 +1,101 @@
-import requests
-
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from time import sleep
-
-import requests
-
 from mage_ai.data_preparation.shared.secrets import get_secret_value
-
-
+from utils.adaptive_concurrency import concurrency_controller_from_kwargs
+from utils.cartpanda_decode import record_to_dict, typed_decoder_from_kwargs
+from utils.cartpanda_fetcher import (
+    DEFAULT_GLOBAL_CONCURRENCY,
+    DEFAULT_PER_SHOP_CONCURRENCY,
+    fetch_records_for_slugs,
+)
+from utils.cartpanda_streaming import (
+    DEFAULT_CHUNK_SIZE,
+    full_load_targets,
+    stream_orders_with_checkpoint,
+    streaming_execution_metadata,
+)
+from utils.checkpoint import CheckpointStore
+from utils.page_cache import page_cache_from_kwargs
+from utils.rate_limiter import get_rate_limiter_for_headers
+from utils.shop_registry import shop_slugs_from_kwargs
+
+# Checkpoint local da carga completa (última página gravada por loja)
+CHECKPOINT_NAME = 'cartpanda_orders_full'
 
 if 'data_loader' not in globals():
-
     from mage_ai.data_preparation.decorators import data_loader
 
 
+# Concurrent API Requests (asyncio: pool global de workers compartilhado pelas lojas)
+def fetch_orders_for_slug(slug, headers, per_shop_concurrency=DEFAULT_PER_SHOP_CONCURRENCY):
+    results = fetch_records_for_slugs(
+        [slug], 'orders', headers, per_shop_concurrency=per_shop_concurrency
+    )
 
-# Concurrent API Requests (Paralelismo) 
-
-def fetch_orders_for_slug(slug, headers):
-
-    API_URL = f'https://accounts.cartpanda.com/api/v3/{slug}/orders'
-
-    page = 1
-
-    all_orders = []
-
-
-
-    while True:
-
-        params = {'page': page, 'limit': 200}
-
-        response = requests.get(API_URL, headers=headers, params=params)
-
-        response.raise_for_status()
-
-
-
-        data = response.json()
-
-        orders = data.get('orders', [])
-
-        meta = data.get('meta', {})
-
-
-
-        print(f"→ {slug} | Página {page}: {len(orders)} pedidos")
-
-
-
-        for order in orders:
-
-            order['shop_slug'] = slug
-
-
-
-        all_orders.extend(orders)
-
-
-
-        if meta.get('current_page', page) >= meta.get('last_page', page):
-
-            break
-
-        page += 1
-
-        sleep(1)
-
-
-
-    return all_orders
-
+    orders = results[slug]
+    if isinstance(orders, Exception):
+        raise orders
+    return orders
 
 
 @data_loader
-
 def cartpanda_orders_extraction(*args, **kwargs):
-
-    slugs = ['vita-waves', 'nutra-force-wl', 'nutra-force-di', 'nutra-force','vita-labs']
-
+    # Lojas do registro (cartpanda_shops.yaml) ou da variável `slugs` do bloco
+    slugs = shop_slugs_from_kwargs(kwargs, 'orders')
     API_KEY = get_secret_value('CARTPANDA_API_KEY')
-
     headers = {
-
         'Authorization': f'Bearer {API_KEY}',
-
         'Accept': 'application/json',
-
     }
 
-
-
     all_orders = []
 
-
-
-    with ThreadPoolExecutor(max_workers=len(slugs)) as executor:
-
-        future_to_slug = {executor.submit(fetch_orders_for_slug, slug, headers): slug for slug in slugs}
-
-
-
-        for future in as_completed(future_to_slug):
-
-            slug = future_to_slug[future]
-
-            try:
-
-                orders = future.result()
-
-                print(f"✅ Coleta finalizada para: {slug} ({len(orders)} pedidos)")
-
-                all_orders.extend(orders)
-
-            except Exception as e:
-
-                print(f"❌ Erro ao coletar pedidos da loja {slug}: {e}")
-
-
+    # Limiter compartilhado pela API key (substitui os sleeps fixos entre páginas)
+    rate_limiter = get_rate_limiter_for_headers(
+        headers, rate=kwargs.get('cartpanda_requests_per_second')
+    )
+    # Janela de requisições simultâneas ajustada por AIMD (latência, 429 e 5xx),
+    # limitada por global_concurrency
+    global_concurrency = int(kwargs.get('global_concurrency', DEFAULT_GLOBAL_CONCURRENCY))
+    concurrency_controller = concurrency_controller_from_kwargs(kwargs, max_window=global_concurrency)
+    fetch_kwargs = dict(
+        per_shop_concurrency=int(kwargs.get('per_shop_concurrency', DEFAULT_PER_SHOP_CONCURRENCY)),
+        global_concurrency=global_concurrency,
+        rate_limiter=rate_limiter,
+        page_cache=page_cache_from_kwargs(kwargs),
+        concurrency_controller=concurrency_controller,
+        decoder=typed_decoder_from_kwargs(kwargs),
+    )
+
+    # Modo streaming (opcional): transforma e faz upsert em lotes por loja enquanto as
+    # páginas chegam, gravando um checkpoint após cada lote. Um retry do bloco ou uma nova
+    # execução retoma de onde parou; lojas já concluídas não são refeitas.
+    # Grava no Railway (obrigatório: uma falha interrompe sem avançar o checkpoint);
+    # `stream_to_replica` também grava na Replicação/VPS, sem interromper se ela falhar.
+    if kwargs.get('streaming'):
+        try:
+            summary, _ = stream_orders_with_checkpoint(
+                slugs, headers, CheckpointStore(CHECKPOINT_NAME),
+                reset=kwargs.get('reset_checkpoint', False),
+                chunk_size=int(kwargs.get('chunk_size', DEFAULT_CHUNK_SIZE)),
+                targets=full_load_targets(include_replica=kwargs.get('stream_to_replica', False)),
+                **fetch_kwargs,
+            )
+        finally:
+            if concurrency_controller is not None:
+                concurrency_controller.log_summary()
+        return streaming_execution_metadata(summary)
+
+    results = fetch_records_for_slugs(slugs, 'orders', headers, **fetch_kwargs)
+    print(f"🚦 Taxa efetiva da API: {rate_limiter.observed_rate:.2f} req/s (limite {rate_limiter.rate:.2f} req/s)")
+    if concurrency_controller is not None:
+        concurrency_controller.log_summary()
+
+    for slug, orders in results.items():
+        if isinstance(orders, Exception):
+            print(f"❌ Erro ao coletar pedidos da loja {slug}: {orders}")
+            continue
+        print(f"✅ Coleta finalizada para: {slug} ({len(orders)} pedidos)")
+        # Structs da decodificação tipada viram dicts (saída do bloco é serializada)
+        all_orders.extend(map(record_to_dict, orders))
 
     print(f"\n📦 Total geral de pedidos coletados: {len(all_orders)}")
-
     return all_orders
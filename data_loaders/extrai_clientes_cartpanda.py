@@ -1,69 +1,112 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from time import sleep
-import requests
 from mage_ai.data_preparation.shared.secrets import get_secret_value
+from utils.adaptive_concurrency import concurrency_controller_from_kwargs
+from utils.cartpanda_fetcher import (
+    DEFAULT_GLOBAL_CONCURRENCY,
+    DEFAULT_PER_SHOP_CONCURRENCY,
+    fetch_records_for_slugs,
+)
+from utils.page_cache import page_cache_from_kwargs
+from utils.rate_limiter import get_rate_limiter_for_headers
+from utils.shop_registry import shop_slugs_from_kwargs
+from utils.sync_state import (
+    DEFAULT_OVERLAP_MINUTES,
+    create_state_engine,
+    load_high_water_marks,
+    to_api_timestamp,
+)
+
+# Fonte usada na tabela de estado (integracao.sync_state); gravada pelo exporter de clientes
+STATE_SOURCE = 'cartpanda_customers'
 
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
 
-# Concurrent API Requests (Paralelismo)
-def fetch_customers_for_slug(slug, headers):
-    API_URL = f'https://accounts.cartpanda.com/api/v3/{slug}/customers'
-    page = 1
-    all_customers = []
-    
-    while True:
-        params = {'page': page, 'limit': 200}
-        response = requests.get(API_URL, headers=headers, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        customers = data.get('customers', [])
-        meta = data.get('meta', {})
-        
-        print(f"→ {slug} | Página {page}: {len(customers)} clientes")
-        
-        # Adiciona o shop_slug a cada cliente
-        for customer in customers:
-            customer['shop_slug'] = slug
-            
-        all_customers.extend(customers)
-        
-        # Verifica se chegou na última página
-        if meta.get('current_page', page) >= meta.get('last_page', page):
-            break
-            
-        page += 1
-        sleep(1)  # Pausa para evitar rate limiting
-        
-    return all_customers
+def get_customers_updated_at_min_by_slug(slugs, overlap_minutes=DEFAULT_OVERLAP_MINUTES):
+    """
+    Calcula o updated_at_min de cada loja a partir do high-water mark salvo.
+    Lojas sem estado salvo (primeira execução ou falha ao ler o estado) ficam
+    sem filtro, ou seja, carga completa.
+    """
+    try:
+        marks = load_high_water_marks(create_state_engine(), STATE_SOURCE)
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o estado incremental, fazendo carga completa: {e}")
+        marks = {}
+
+    return {
+        slug: to_api_timestamp(marks[slug], overlap_minutes)
+        for slug in slugs if slug in marks
+    }
+
+# Concurrent API Requests (via CartPandaClient: pool keep-alive, retentativas e circuit breaker)
+def fetch_customers_for_slug(slug, headers, rate_limiter=None, updated_at_min=None,
+                             per_shop_concurrency=DEFAULT_PER_SHOP_CONCURRENCY):
+    params = {'updated_at_min': updated_at_min} if updated_at_min else None
+    results = fetch_records_for_slugs(
+        [slug], 'customers', headers, params,
+        per_shop_concurrency=per_shop_concurrency, rate_limiter=rate_limiter,
+    )
+
+    customers = results[slug]
+    if isinstance(customers, Exception):
+        raise customers
+    return customers
 
 @data_loader
 def cartpanda_customers_extraction(*args, **kwargs):
-    slugs = ['vita-waves', 'nutra-force-wl', 'nutra-force-di', 'nutra-force']
-    
+    # Lojas do registro (cartpanda_shops.yaml) ou da variável `slugs` do bloco
+    slugs = shop_slugs_from_kwargs(kwargs, 'customers')
+
     API_KEY = get_secret_value('CARTPANDA_API_KEY')
     headers = {
         'Authorization': f'Bearer {API_KEY}',
         'Accept': 'application/json',
     }
-    
+
     all_customers = []
-    
-    with ThreadPoolExecutor(max_workers=len(slugs)) as executor:
-        # Submete todas as tarefas
-        future_to_slug = {executor.submit(fetch_customers_for_slug, slug, headers): slug for slug in slugs}
-        
-        # Processa os resultados conforme ficam prontos
-        for future in as_completed(future_to_slug):
-            slug = future_to_slug[future]
-            try:
-                customers = future.result()
-                print(f"✅ Coleta finalizada para: {slug} ({len(customers)} clientes)")
-                all_customers.extend(customers)
-            except Exception as e:
-                print(f"❌ Erro ao coletar clientes da loja {slug}: {e}")
-    
+
+    # Incremental por padrão: só clientes atualizados desde o último export (high-water mark).
+    # `full_refresh=True` força a varredura completa.
+    if kwargs.get('full_refresh'):
+        print("🔄 Carga completa de clientes (full_refresh)")
+        updated_at_min_by_slug = {}
+    else:
+        overlap_minutes = kwargs.get('hwm_overlap_minutes', DEFAULT_OVERLAP_MINUTES)
+        updated_at_min_by_slug = get_customers_updated_at_min_by_slug(slugs, overlap_minutes)
+        print(f"🔄 Extração incremental de clientes (sobreposição de {overlap_minutes} min)")
+        for slug in slugs:
+            print(f"   {slug}: updated_at_min (UTC) = {updated_at_min_by_slug.get(slug, 'carga completa')}")
+
+    params_by_slug = {
+        slug: {'updated_at_min': updated_at_min}
+        for slug, updated_at_min in updated_at_min_by_slug.items()
+    }
+    rate_limiter = get_rate_limiter_for_headers(
+        headers, rate=kwargs.get('cartpanda_requests_per_second')
+    )
+    global_concurrency = int(kwargs.get('global_concurrency', DEFAULT_GLOBAL_CONCURRENCY))
+    concurrency_controller = concurrency_controller_from_kwargs(kwargs, max_window=global_concurrency)
+
+    # Páginas de todas as lojas num pool global de workers (divisão justa por backlog)
+    results = fetch_records_for_slugs(
+        slugs, 'customers', headers,
+        params_by_slug=params_by_slug,
+        per_shop_concurrency=int(kwargs.get('per_shop_concurrency', DEFAULT_PER_SHOP_CONCURRENCY)),
+        global_concurrency=global_concurrency,
+        rate_limiter=rate_limiter,
+        page_cache=page_cache_from_kwargs(kwargs),
+        concurrency_controller=concurrency_controller,
+    )
+
+    for slug, customers in results.items():
+        if isinstance(customers, Exception):
+            print(f"❌ Erro ao coletar clientes da loja {slug}: {customers}")
+            continue
+        print(f"✅ Coleta finalizada para: {slug} ({len(customers)} clientes)")
+        all_customers.extend(customers)
+
+    print(f"🚦 Taxa efetiva da API: {rate_limiter.observed_rate:.2f} req/s (limite {rate_limiter.rate:.2f} req/s)")
+    if concurrency_controller is not None:
+        concurrency_controller.log_summary()
     print(f"\n👥 Total geral de clientes coletados: {len(all_customers)}")
-    return all_customers
\ No newline at end of file
+    return all_customers
@@ -1,9 +1,31 @@
-import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from time import sleep
 from datetime import datetime, timedelta
 import pytz
 from mage_ai.data_preparation.shared.secrets import get_secret_value
+from utils.cartpanda_decode import record_to_dict, typed_decoder_from_kwargs
+from utils.cartpanda_fetcher import (
+    DEFAULT_GLOBAL_CONCURRENCY,
+    DEFAULT_PER_SHOP_CONCURRENCY,
+    fetch_records_for_slugs,
+)
+from utils.adaptive_concurrency import concurrency_controller_from_kwargs
+from utils.page_cache import page_cache_from_kwargs
+from utils.rate_limiter import get_rate_limiter_for_headers
+from utils.shop_registry import shop_slugs_from_kwargs
+from utils.cartpanda_streaming import (
+    DEFAULT_CHUNK_SIZE,
+    stream_orders_to_postgres,
+    streaming_execution_metadata,
+)
+from utils.sync_state import (
+    DEFAULT_OVERLAP_MINUTES,
+    create_state_engine,
+    load_high_water_marks,
+    save_high_water_marks,
+    to_api_timestamp,
+)
+
+# Fonte usada na tabela de estado (integracao.sync_state)
+STATE_SOURCE = 'cartpanda_orders'
 
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
@@ -25,53 +47,43 @@ def get_updated_at_min():
     # Formato ISO 8601 que a API CartPanda espera
     return midnight_utc.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
 
-def fetch_orders_for_slug(slug, headers, updated_at_min=None):
+def get_updated_at_min_by_slug(slugs, overlap_minutes=DEFAULT_OVERLAP_MINUTES):
     """
-    Busca pedidos de uma loja específica, opcionalmente filtrados por data de atualização
+    Calcula o updated_at_min de cada loja a partir do high-water mark salvo
+    (maior updated_at já exportado) menos a janela de sobreposição.
+    Lojas sem estado salvo (ou falha ao ler o estado) usam a meia-noite do Brasil.
     """
-    API_URL = f'https://accounts.cartpanda.com/api/v3/{slug}/orders'
-    page = 1
-    all_orders = []
-
-    while True:
-        params = {'page': page, 'limit': 200}
-        
-        # Adiciona filtro de data se fornecido
-        if updated_at_min:
-            params['updated_at_min'] = updated_at_min
-
-        try:
-            response = requests.get(API_URL, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Erro na requisição para {slug} página {page}: {e}")
-            break
-
-        data = response.json()
-        orders = data.get('orders', [])
-        meta = data.get('meta', {})
-
-        brazil_date = datetime.now(pytz.timezone('America/Sao_Paulo')).strftime('%d/%m/%Y')
-        filter_info = f" (desde meia-noite BR: {brazil_date})" if updated_at_min else ""
-        print(f"→ {slug} | Página {page}: {len(orders)} pedidos{filter_info}")
-
-        # Adiciona o shop_slug a cada pedido
-        for order in orders:
-            order['shop_slug'] = slug
-
-        all_orders.extend(orders)
-
-        # Verifica se chegou na última página
-        current_page = meta.get('current_page', page)
-        last_page = meta.get('last_page', page)
-        
-        if current_page >= last_page:
-            break
-        
-        page += 1
-        sleep(0.5)  # Reduzido para 500ms já que fazemos menos requisições
+    fallback = get_updated_at_min()
+    try:
+        marks = load_high_water_marks(create_state_engine(), STATE_SOURCE)
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o estado incremental, usando meia-noite do Brasil: {e}")
+        marks = {}
+
+    updated_at_min_by_slug = {}
+    for slug in slugs:
+        if slug in marks:
+            updated_at_min_by_slug[slug] = to_api_timestamp(marks[slug], overlap_minutes)
+        else:
+            updated_at_min_by_slug[slug] = fallback
+    return updated_at_min_by_slug
+
+def fetch_orders_for_slug(slug, headers, updated_at_min=None,
+                          per_shop_concurrency=DEFAULT_PER_SHOP_CONCURRENCY):
+    """
+    Busca pedidos de uma loja específica, opcionalmente filtrados por data de atualização.
+    As páginas após a primeira são buscadas em paralelo.
+    """
+    params = {'updated_at_min': updated_at_min} if updated_at_min else None
+    results = fetch_records_for_slugs(
+        [slug], 'orders', headers, params,
+        per_shop_concurrency=per_shop_concurrency,
+    )
 
-    return all_orders
+    orders = results[slug]
+    if isinstance(orders, Exception):
+        raise orders
+    return orders
 
 @data_loader
 def cartpanda_orders_extraction(*args, **kwargs):
@@ -79,7 +91,8 @@ def cartpanda_orders_extraction(*args, **kwargs):
     Extrai pedidos do CartPanda com filtro incremental baseado em updated_at_min
     Retorna sempre uma estrutura válida, mesmo quando não há dados
     """
-    slugs = ['vita-waves', 'nutra-force-wl', 'nutra-force-di', 'nutra-force', 'vita-labs']
+    # Lojas do registro (cartpanda_shops.yaml) ou da variável `slugs` do bloco
+    slugs = shop_slugs_from_kwargs(kwargs, 'orders')
     API_KEY = get_secret_value('CARTPANDA_API_KEY')
     
     headers = {
@@ -88,40 +101,78 @@ def cartpanda_orders_extraction(*args, **kwargs):
         'Content-Type': 'application/json'
     }
 
-    # Calcula o timestamp para extração desde meia-noite (Brasil)
-    updated_at_min = get_updated_at_min()
+    # Calcula o timestamp de cada loja a partir do último updated_at exportado (high-water mark)
+    overlap_minutes = kwargs.get('hwm_overlap_minutes', DEFAULT_OVERLAP_MINUTES)
+    updated_at_min_by_slug = get_updated_at_min_by_slug(slugs, overlap_minutes)
     
     # Mostra info em horário do Brasil para debug
     brazil_tz = pytz.timezone('America/Sao_Paulo')
     brazil_time = datetime.now(brazil_tz)
-    print(f"🔄 Executando extração desde meia-noite do Brasil ({brazil_time.strftime('%d/%m/%Y')})")
-    print(f"   Timestamp UTC enviado para API: {updated_at_min}")
+    print(f"🔄 Executando extração incremental ({brazil_time.strftime('%d/%m/%Y %H:%M')}, sobreposição de {overlap_minutes} min)")
+    for slug, updated_at_min in updated_at_min_by_slug.items():
+        print(f"   {slug}: updated_at_min (UTC) = {updated_at_min}")
     
     # Variável para controlar se é primeira execução (para testes)
     # Se quiser fazer carga completa, descomente a linha abaixo:
-    # updated_at_min = None
+    # updated_at_min_by_slug = {}
     
     all_orders = []
 
-    # Execução paralela para todas as lojas
-    with ThreadPoolExecutor(max_workers=len(slugs)) as executor:
-        future_to_slug = {
-            executor.submit(fetch_orders_for_slug, slug, headers, updated_at_min): slug 
-            for slug in slugs
-        }
-
-        for future in as_completed(future_to_slug):
-            slug = future_to_slug[future]
-            try:
-                orders = future.result()
-                if orders:
-                    print(f"✅ {slug}: {len(orders)} pedidos coletados")
-                    all_orders.extend(orders)
-                else:
-                    print(f"ℹ️  {slug}: Nenhum pedido novo/atualizado")
-                    
-            except Exception as e:
-                print(f"❌ Erro ao coletar pedidos de {slug}: {e}")
+    # Execução assíncrona: páginas de todas as lojas num pool global de workers (divisão justa por backlog)
+    params_by_slug = {
+        slug: {'updated_at_min': updated_at_min}
+        for slug, updated_at_min in updated_at_min_by_slug.items()
+    }
+    # Limiter compartilhado pela API key (substitui os sleeps fixos entre páginas)
+    rate_limiter = get_rate_limiter_for_headers(
+        headers, rate=kwargs.get('cartpanda_requests_per_second')
+    )
+    # Janela de requisições simultâneas ajustada por AIMD (latência, 429 e 5xx),
+    # limitada por global_concurrency
+    global_concurrency = int(kwargs.get('global_concurrency', DEFAULT_GLOBAL_CONCURRENCY))
+    concurrency_controller = concurrency_controller_from_kwargs(kwargs, max_window=global_concurrency)
+    fetch_kwargs = dict(
+        params_by_slug=params_by_slug,
+        per_shop_concurrency=int(kwargs.get('per_shop_concurrency', DEFAULT_PER_SHOP_CONCURRENCY)),
+        global_concurrency=global_concurrency,
+        rate_limiter=rate_limiter,
+        page_cache=page_cache_from_kwargs(kwargs),
+        concurrency_controller=concurrency_controller,
+        decoder=typed_decoder_from_kwargs(kwargs),
+    )
+
+    # Modo streaming: transforma e faz upsert em lotes enquanto as páginas chegam
+    if kwargs.get('streaming'):
+        summary, writer = stream_orders_to_postgres(
+            slugs, headers, chunk_size=int(kwargs.get('chunk_size', DEFAULT_CHUNK_SIZE)), **fetch_kwargs
+        )
+        if concurrency_controller is not None:
+            concurrency_controller.log_summary()
+        if writer.failed_targets:
+            print("⚠️ High-water mark não avançado: exportação para Railway falhou")
+        else:
+            # Só avança lojas cuja extração terminou sem erro
+            high_water_marks = {
+                slug: mark for slug, mark in writer.high_water_marks.items()
+                if slug not in summary['errors']
+            }
+            save_high_water_marks(create_state_engine(), STATE_SOURCE, high_water_marks)
+        return streaming_execution_metadata(summary)
+
+    results = fetch_records_for_slugs(slugs, 'orders', headers, **fetch_kwargs)
+    print(f"🚦 Taxa efetiva da API: {rate_limiter.observed_rate:.2f} req/s (limite {rate_limiter.rate:.2f} req/s)")
+    if concurrency_controller is not None:
+        concurrency_controller.log_summary()
+
+    for slug, orders in results.items():
+        if isinstance(orders, Exception):
+            print(f"❌ Erro ao coletar pedidos de {slug}: {orders}")
+        elif orders:
+            print(f"✅ {slug}: {len(orders)} pedidos coletados")
+            # Structs da decodificação tipada viram dicts (saída do bloco é serializada)
+            all_orders.extend(map(record_to_dict, orders))
+        else:
+            print(f"ℹ️  {slug}: Nenhum pedido novo/atualizado")
 
     # Log final e preparação do retorno
     if all_orders:
@@ -142,7 +193,7 @@ def cartpanda_orders_extraction(*args, **kwargs):
         return all_orders
     else:
         brazil_date = datetime.now(pytz.timezone('America/Sao_Paulo')).strftime('%d/%m/%Y')
-        print(f"\nℹ️  Nenhum pedido novo/atualizado encontrado desde meia-noite do Brasil ({brazil_date})")
+        print(f"\nℹ️  Nenhum pedido novo/atualizado encontrado desde a última execução ({brazil_date})")
         print("✨ Pipeline será encerrado graciosamente - nenhum dado para processar")
         
         # SOLUÇÃO 1: Retorna lista vazia (mais simples)
@@ -1,6 +1,18 @@
 import pandas as pd
-import requests
-import time
+from utils.movidesk_client import DEFAULT_CONCURRENCY, PAGE_SIZE, fetch_tickets
+from utils.sync_state import (
+    DEFAULT_OVERLAP_MINUTES,
+    create_state_engine,
+    load_high_water_marks,
+    to_api_timestamp,
+)
+
+# Fonte/chave na tabela de estado (integracao.sync_state); gravada pelo exporter de tickets
+STATE_SOURCE = 'movidesk_tickets'
+STATE_KEY = 'tickets'
+
+# Início da carga quando ainda não há high-water mark salvo
+INITIAL_LAST_UPDATE = '2025-06-23T00:00:00.00Z'
 
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
@@ -8,77 +20,63 @@ if 'test' not in globals():
     from mage_ai.data_preparation.decorators import test
 
 
-@data_loader
-def load_data_from_api(*args, **kwargs):
+def get_last_update_min(overlap_minutes=DEFAULT_OVERLAP_MINUTES):
     """
-    1. Carrega todos os tickets paginando de 500 em 500 (só com campos básicos).
-    2. Em seguida, busca detalhes ticket por ticket com base no ID.
-    3. Retorna DataFrame com os dados completos, com colunas achatadas.
+    Maior `lastUpdate` já exportado menos a janela de sobreposição, ou o início
+    da carga se não houver estado salvo (ou falhar a leitura)
     """
-    # Parte 1: busca paginada de IDs
-    paginated_url = (
-        "https://api.movidesk.com/public/v1/tickets?"
-        "token=0d94a20f-8535-4db0-94c5-ac3c2fe36f80&"
-        "$select=id&"
-        "$filter=createdDate gt 2025-06-23T00:00:00.00Z& or lastUpdated gt 2025-06-23T00:00:00.00Z&"
-        "$orderby=id desc&$top=500&$skip={skip}"
-    )
-
-    all_ids = []
-    skip = 0
-    while True:
-        url = paginated_url.format(skip=skip)
-        print(f"Fetching IDs from: {url}")
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-            if not data:
-                break
+    try:
+        marks = load_high_water_marks(create_state_engine(), STATE_SOURCE)
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o estado incremental, usando {INITIAL_LAST_UPDATE}: {e}")
+        marks = {}
 
-            ids_page = [ticket['id'] for ticket in data if 'id' in ticket]
-            all_ids.extend(ids_page)
-            skip += 500
+    if STATE_KEY in marks:
+        return to_api_timestamp(marks[STATE_KEY], overlap_minutes)
+    return INITIAL_LAST_UPDATE
 
-            time.sleep(0.4)
-        except Exception as e:
-            print(f"Erro ao buscar IDs (skip={skip}): {e}")
-            break
 
-    total_ids = len(all_ids)
-    print(f"\n🔄 Total de IDs encontrados: {total_ids}\n")
-
-    # Parte 2: busca detalhe ticket a ticket com barra de progresso
-    detail_url_template = "https://api.movidesk.com/public/v1/tickets?token=0d94a20f-8535-4db0-94c5-ac3c2fe36f80&id={ticket_id}"
-    all_tickets = []
-
-    for idx, ticket_id in enumerate(all_ids, 1):
-        url = detail_url_template.format(ticket_id=ticket_id)
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
+@data_loader
+def load_data_from_api(*args, **kwargs):
+    """
+    1. Carrega os tickets alterados desde o último export (`lastUpdate` acima do
+       high-water mark) em lotes de 500, com $select/$expand dos campos usados
+       e vários `$skip` em paralelo.
+    2. Busca por ID (em paralelo, com rate limit) só os tickets cujo lote falhou
+       ou cujas ações vieram incompletas; se algum falhar, o bloco falha (sem
+       exportar nem avançar o high-water mark).
+    3. Retorna DataFrame com os dados completos, com colunas achatadas.
+    """
+    if kwargs.get('full_refresh'):
+        last_update_min = INITIAL_LAST_UPDATE
+    else:
+        last_update_min = get_last_update_min(kwargs.get('hwm_overlap_minutes', DEFAULT_OVERLAP_MINUTES))
+    print(f"🔄 Tickets com lastUpdate > {last_update_min}")
 
-            if isinstance(data, list) and len(data) > 0:
-                all_tickets.append(data[0])
-            elif isinstance(data, dict):
-                all_tickets.append(data)
-        except Exception as e:
-            print(f"[{idx}/{total_ids}] ❌ Erro ao buscar ticket {ticket_id}: {e}")
-            continue
+    all_tickets, errors = fetch_tickets(
+        f"lastUpdate gt {last_update_min}",
+        rate=kwargs.get('movidesk_requests_per_second'),
+        concurrency=kwargs.get('movidesk_concurrency', DEFAULT_CONCURRENCY),
+        page_size=kwargs.get('movidesk_page_size', PAGE_SIZE),
+    )
 
-        print(f"[{idx}/{total_ids}] ✅ Ticket {ticket_id} carregado")
-        # time.sleep(0.1)
+    if errors:
+        # Falha o bloco: exportar os demais avançaria o high-water mark além desses tickets
+        raise Exception(
+            f"{len(errors)} tickets não puderam ser carregados: {sorted(errors)[:20]}"
+        )
 
+    print(f"\n🔄 Total de tickets carregados: {len(all_tickets)}\n")
+    if not all_tickets:
+        return pd.DataFrame(columns=['id'])
     return pd.json_normalize(all_tickets)
 
 
 @test
 def test_output(output, *args) -> None:
     """
-    Valida se os dados foram carregados corretamente.
+    Valida se os dados foram carregados corretamente (vazio é válido na
+    extração incremental: nenhum ticket alterado).
     """
     assert output is not None, 'The output is undefined'
-    assert not output.empty, 'O DataFrame está vazio'
     assert 'id' in output.columns, 'Coluna "id" ausente'
\ No newline at end of file
@@ -1,6 +1,5 @@
 import pandas as pd
-import requests
-import time
+from utils import movidesk_client
 
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
@@ -14,26 +13,13 @@ def fetch_ticket_details(*args, **kwargs):
     Recebe uma lista de IDs e retorna um DataFrame com os detalhes de cada ticket.
     """
     ticket_ids = args[0]  # lista de IDs vinda do bloco anterior
-    token = "0d94a20f-8535-4db0-94c5-ac3c2fe36f80"
 
-    base_url = "https://api.movidesk.com/public/v1/tickets"
-    all_tickets = []
-
-    for ticket_id in ticket_ids:
-        url = f"{base_url}?token={token}&id={ticket_id}"
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-            if isinstance(data, list) and len(data) > 0:
-                all_tickets.append(data[0])
-            elif isinstance(data, dict):
-                all_tickets.append(data)
-        except Exception as e:
-            print(f"Erro ao buscar ticket {ticket_id}: {e}")
-        
-        time.sleep(0.2)  # respeita a limitação da API
+    # Em paralelo, limitado pelo rate limiter do token (substitui o sleep de 0.2s por ticket)
+    all_tickets = movidesk_client.fetch_ticket_details(
+        list(ticket_ids),
+        rate=kwargs.get('movidesk_requests_per_second'),
+        concurrency=kwargs.get('movidesk_concurrency', movidesk_client.DEFAULT_CONCURRENCY),
+    )
 
     return pd.DataFrame(all_tickets)
 
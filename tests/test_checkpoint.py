@@ -0,0 +1,109 @@
+"""
+Carga completa em streaming retomável: o checkpoint avança só após cada lote
+gravado, é retomado na execução seguinte e apagado ao final.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from utils.checkpoint import CheckpointStore
+
+SLUG = 'loja-a'
+LAST_PAGE = 5
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    pytest.importorskip('mage_ai')
+    from utils import cartpanda_streaming
+
+    requested = []
+
+    class FakeClient:
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        async def get_page(self, slug, endpoint, params, page):
+            requested.append(page)
+            return {'orders': [{'id': page}], 'meta': {'last_page': LAST_PAGE}}
+
+    class FakeWriter:
+        # Falha ao gravar o lote que contém o pedido `fail_on`
+        fail_on = None
+
+        def __init__(self, targets):
+            self.failed_targets = set()
+            self.orders_written = 0
+            self.items_written = 0
+
+        def __call__(self, orders):
+            if any(order['id'] == FakeWriter.fail_on for order in orders):
+                raise RuntimeError('falha no upsert')
+            self.orders_written += len(orders)
+
+    monkeypatch.setattr(cartpanda_streaming, 'CartPandaClient', FakeClient)
+    monkeypatch.setattr(cartpanda_streaming, 'OrdersChunkWriter', FakeWriter)
+
+    def run(store, **kwargs):
+        return cartpanda_streaming.stream_orders_with_checkpoint(
+            [SLUG], headers={}, checkpoints=store, chunk_size=1,
+            targets=[('Teste', None, True)], **kwargs,
+        )
+
+    return SimpleNamespace(run=run, requested=requested, writer=FakeWriter)
+
+
+def test_retoma_depois_da_ultima_pagina_gravada(streaming, tmp_path):
+    CheckpointStore('carga', directory=tmp_path).commit(SLUG, page=3)
+
+    # Nova execução (novo processo): lê o checkpoint do arquivo
+    store = CheckpointStore('carga', directory=tmp_path)
+    summary, _ = streaming.run(store)
+
+    assert sorted(streaming.requested) == [4, 5]
+    assert summary['records'] == 2
+
+
+def test_carga_concluida_apaga_o_checkpoint(streaming, tmp_path):
+    store = CheckpointStore('carga', directory=tmp_path)
+    streaming.run(store)
+
+    assert sorted(streaming.requested) == list(range(1, LAST_PAGE + 1))
+    assert not (tmp_path / 'carga.json').exists()
+
+
+def test_reset_descarta_o_checkpoint(streaming, tmp_path):
+    CheckpointStore('carga', directory=tmp_path).commit(SLUG, page=LAST_PAGE, finished=True)
+
+    streaming.run(CheckpointStore('carga', directory=tmp_path), reset=True)
+
+    assert sorted(streaming.requested) == list(range(1, LAST_PAGE + 1))
+    assert not (tmp_path / 'carga.json').exists()
+
+
+def test_lote_com_falha_nao_avanca_o_checkpoint(streaming, tmp_path):
+    streaming.writer.fail_on = 3
+
+    with pytest.raises(RuntimeError):
+        streaming.run(CheckpointStore('carga', directory=tmp_path))
+
+    store = CheckpointStore('carga', directory=tmp_path)
+    assert store.next_page(SLUG) == 3
+    assert not store.is_finished(SLUG)
+
+
+def test_loja_concluida_nao_e_refeita(streaming, tmp_path):
+    store = CheckpointStore('carga', directory=tmp_path)
+    store.commit(SLUG, page=LAST_PAGE, finished=True)
+
+    summary, _ = streaming.run(store)
+
+    assert streaming.requested == []
+    assert summary['records'] == 0
@@ -0,0 +1,49 @@
+"""
+Conversão de valores monetários (`parse_money`), com e sem pyarrow.
+"""
+import math
+
+import pytest
+
+from utils import column_types
+from utils.column_types import parse_money
+
+
+@pytest.fixture(params=['pyarrow', 'python'])
+def parse(request, monkeypatch):
+    if request.param == 'pyarrow':
+        if column_types.pa is None:
+            pytest.skip('pyarrow não instalado')
+    else:
+        monkeypatch.setattr(column_types, 'pa', None)
+    return lambda values: list(parse_money(values))
+
+
+def _same(parsed, expected):
+    assert len(parsed) == len(expected)
+    for number, value in zip(parsed, expected):
+        if value is None:
+            assert math.isnan(number)
+        else:
+            assert number == pytest.approx(value)
+
+
+def test_separador_decimal_pela_posicao(parse):
+    _same(parse(['1.234,56', '1,234.56', '1234,56', '1234.56']), [1234.56, 1234.56, 1234.56, 1234.56])
+
+
+def test_inteiro(parse):
+    _same(parse(['1234', ' 10 ']), [1234, 10])
+
+
+def test_ausente_e_vazio(parse):
+    _same(parse([None, '', '   ']), [None, None, None])
+
+
+def test_numeros_e_textos_misturados(parse):
+    _same(parse([5, 2.5, '1.234,56', None]), [5, 2.5, 1234.56, None])
+
+
+def test_invalido_vira_nulo(parse, capsys):
+    _same(parse(['abc', '1,2,3', '10,50']), [None, None, 10.5])
+    assert '2 valores monetários inválidos' in capsys.readouterr().out
@@ -0,0 +1,90 @@
+"""
+Escalonador de páginas: entrega em ordem por loja, isolamento de falhas entre
+lojas e limite de páginas adiantadas (`max_ahead`).
+"""
+import asyncio
+
+from utils.page_scheduler import PageScheduler
+
+
+class FakeClient:
+    """
+    Cliente de mentira: `pages` = {slug: last_page}; `delays` = {(slug, página):
+    segundos}; `failures` = {(slug, página)}; `gates` = {(slug, página): Event}
+    """
+
+    def __init__(self, pages, delays=None, failures=(), gates=None):
+        self.pages = pages
+        self.delays = delays or {}
+        self.failures = set(failures)
+        self.gates = gates or {}
+        self.requested = []
+
+    async def get_page(self, slug, endpoint, params, page):
+        self.requested.append((slug, page))
+        await asyncio.sleep(self.delays.get((slug, page), 0))
+        if (slug, page) in self.gates:
+            await self.gates[(slug, page)].wait()
+        if (slug, page) in self.failures:
+            raise RuntimeError(f'falha em {slug} página {page}')
+        return {'orders': [{'id': f'{slug}-{page}'}], 'meta': {'last_page': self.pages[slug]}}
+
+
+def _scheduler(client, delivered, ended, **kwargs):
+    def on_page(slug, page, records):
+        delivered.setdefault(slug, []).append(page)
+
+    def on_end(slug, error):
+        ended[slug] = error
+
+    return PageScheduler(client, 'orders', list(client.pages), on_page, on_end, **kwargs)
+
+
+def test_paginas_entregues_em_ordem():
+    # Páginas iniciais mais lentas que as seguintes: chegam fora de ordem
+    client = FakeClient(
+        {'loja-a': 6, 'loja-b': 3},
+        delays={('loja-a', 2): 0.03, ('loja-a', 3): 0.02, ('loja-b', 2): 0.02},
+    )
+    delivered, ended = {}, {}
+
+    errors = asyncio.run(_scheduler(client, delivered, ended, workers=4).run())
+
+    assert errors == {}
+    assert delivered == {'loja-a': [1, 2, 3, 4, 5, 6], 'loja-b': [1, 2, 3]}
+    assert ended == {'loja-a': None, 'loja-b': None}
+
+
+def test_loja_com_falha_nao_trava_as_demais():
+    client = FakeClient({'loja-a': 4, 'loja-b': 4}, failures={('loja-b', 2)})
+    delivered, ended = {}, {}
+
+    errors = asyncio.run(_scheduler(client, delivered, ended, workers=2).run())
+
+    assert list(errors) == ['loja-b']
+    assert delivered['loja-a'] == [1, 2, 3, 4]
+    assert delivered['loja-b'][:1] == [1]
+    assert 2 not in delivered['loja-b']
+    assert ended['loja-a'] is None
+    assert isinstance(ended['loja-b'], RuntimeError)
+
+
+def test_max_ahead_limita_paginas_adiantadas():
+    async def scenario():
+        gate = asyncio.Event()
+        client = FakeClient({'loja-a': 10}, gates={('loja-a', 2): gate})
+        delivered, ended = {}, {}
+        scheduler = _scheduler(client, delivered, ended, workers=5, max_ahead=3)
+
+        task = asyncio.ensure_future(scheduler.run())
+        await asyncio.sleep(0.05)
+        # Página 2 presa: no máximo `max_ahead` páginas entre buscadas e à espera
+        requested_while_blocked = sorted(page for _, page in client.requested)
+        gate.set()
+        await task
+        return requested_while_blocked, delivered
+
+    requested_while_blocked, delivered = asyncio.run(scenario())
+
+    assert requested_while_blocked == [1, 2, 3, 4]
+    assert delivered['loja-a'] == list(range(1, 11))
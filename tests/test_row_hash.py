@@ -0,0 +1,39 @@
+"""
+O hash de conteúdo de um pedido (e dos seus itens) não depende do lote.
+"""
+from utils.cartpanda_transform import transform_orders
+from utils.row_hash import HASH_COLUMN
+
+ORDER = {
+    'id': 1, 'status_id': 3, 'test': False, 'total_price': '10.50',
+    'customer': {'id': 7, 'first_name': 'Ana'}, 'shop_slug': 'loja-a',
+    'tax_lines': [{'price': '0.00', 'title': 'ICMS'}],
+    'line_items': [{'id': 11, 'name': 'Produto', 'quantity': 1, 'total_price': '10.50'}],
+}
+
+# Outro pedido com nulos e campos faltando: mudaria o dtype/colunas do lote
+OTHER = {
+    'id': 2, 'status_id': None, 'test': None, 'total_price': '1,5', 'customer': None,
+    'shop_slug': 'loja-b', 'note': 'x',
+    'line_items': [{'id': 12, 'name': None, 'quantity': None, 'total_price': 'abc'}],
+}
+
+
+def _hashes(orders):
+    df_orders, df_items = transform_orders(orders, verbose=False)
+    order_hash = df_orders.set_index('id')[HASH_COLUMN].astype('int64')
+    item_hash = df_items.set_index('item_id')[HASH_COLUMN].astype('int64')
+    return order_hash, item_hash
+
+
+def test_hash_independe_do_lote():
+    alone_orders, alone_items = _hashes([ORDER])
+    mixed_orders, mixed_items = _hashes([OTHER, ORDER])
+
+    assert alone_orders[1] == mixed_orders[1]
+    assert alone_items[11] == mixed_items[11]
+
+
+def test_hash_muda_com_o_conteudo():
+    changed = dict(ORDER, status_id=4)
+    assert _hashes([ORDER])[0][1] != _hashes([changed])[0][1]
@@ -12,10 +12,18 @@ def transform_cartpanda_customers_data(data, *args, **kwargs):
     # Campos principais da tabela de clientes
     selected_fields = [
         "id", "email", "first_name", "last_name", "shop_id", "shop_slug", 
-        "created_at", "default_address.country", "default_address.city", 
+        "created_at", "updated_at", "default_address.country", "default_address.city", 
         "default_address.zip", "default_address.province"
     ]
 
+    # Extração incremental sem clientes novos/atualizados: nada a exportar
+    if not all_customers:
+        print("ℹ️  Nenhum cliente novo/atualizado para processar")
+        return {
+            "customers_df": pd.DataFrame(),
+            "addresses_df": pd.DataFrame()
+        }
+
     # Cria DataFrame com clientes
     df_customers = pd.json_normalize(all_customers, sep='.')
 
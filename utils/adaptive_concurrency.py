@@ -0,0 +1,180 @@
+"""
+Controle adaptativo (AIMD) do número de requisições simultâneas à API.
+
+- Aumento aditivo: cada resposta rápida e bem-sucedida soma 1/janela, ou seja,
+  a janela cresce ~1 requisição por "rodada" completa.
+- Redução multiplicativa: 429, 5xx, erro de rede ou latência acima de
+  `latency_tolerance` × latência de referência multiplicam a janela por
+  `decrease_factor` (no máximo uma vez por latência média, para que uma
+  rajada de erros da mesma rodada não derrube a janela a zero).
+- Neutro: erros do cliente (400/401/403/404, não retentados) não dizem nada
+  sobre a carga da API e não alteram a janela.
+"""
+import asyncio
+import time
+from collections import deque
+
+DEFAULT_MIN_WINDOW = 1
+DEFAULT_MAX_WINDOW = 20
+DEFAULT_INITIAL_WINDOW = 4
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_LATENCY_TOLERANCE = 3.0
+
+# Suavização (EWMA) da latência média
+LATENCY_SMOOTHING = 0.2
+
+OUTCOME_OK = 'ok'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_ERROR = 'error'
+OUTCOME_CLIENT_ERROR = 'client_error'
+
+
+class AIMDController:
+    """
+    Semáforo com limite ajustável. Uso dentro do event loop:
+
+        await controller.acquire()
+        started = time.monotonic()
+        ... requisição ...
+        controller.release(time.monotonic() - started, OUTCOME_OK)
+    """
+
+    def __init__(self, min_window=DEFAULT_MIN_WINDOW, max_window=DEFAULT_MAX_WINDOW,
+                 initial_window=DEFAULT_INITIAL_WINDOW, decrease_factor=DEFAULT_DECREASE_FACTOR,
+                 latency_tolerance=DEFAULT_LATENCY_TOLERANCE):
+        self.min_window = min_window
+        self.max_window = max_window
+        self.window = float(min(max(initial_window, min_window), max_window))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+
+        self.in_flight = 0
+        self.base_latency = None
+        self.avg_latency = None
+        self._last_decrease = 0.0
+        self._waiters = deque()
+
+        self.started_at = time.monotonic()
+        self.completed = 0
+        self.throttled = 0
+        self.errors = 0
+        self.client_errors = 0
+        self.decreases = 0
+        self.max_window_seen = self.window
+        self.min_window_seen = self.window
+        self._window_area = 0.0
+        self._window_changed_at = self.started_at
+
+    @property
+    def limit(self):
+        return max(self.min_window, int(self.window))
+
+    async def acquire(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, latency, outcome=OUTCOME_OK):
+        self.in_flight -= 1
+        self._observe(latency, outcome)
+        self._wake()
+
+    def _wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _set_window(self, window):
+        now = time.monotonic()
+        self._window_area += self.window * (now - self._window_changed_at)
+        self._window_changed_at = now
+        self.window = min(max(window, self.min_window), self.max_window)
+        self.max_window_seen = max(self.max_window_seen, self.window)
+        self.min_window_seen = min(self.min_window_seen, self.window)
+
+    def _observe(self, latency, outcome):
+        if outcome == OUTCOME_CLIENT_ERROR:
+            self.client_errors += 1
+            return
+        if outcome == OUTCOME_OK:
+            self.completed += 1
+            if self.base_latency is None or latency < self.base_latency:
+                self.base_latency = latency
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+        elif outcome == OUTCOME_THROTTLED:
+            self.throttled += 1
+        else:
+            self.errors += 1
+
+        slow = (
+            outcome == OUTCOME_OK
+            and self.base_latency is not None
+            and latency > self.base_latency * self.latency_tolerance
+        )
+
+        if outcome != OUTCOME_OK or slow:
+            now = time.monotonic()
+            cooldown = self.avg_latency or latency
+            if now - self._last_decrease >= cooldown:
+                self._last_decrease = now
+                self.decreases += 1
+                self._set_window(self.window * self.decrease_factor)
+        else:
+            self._set_window(self.window + 1.0 / self.window)
+
+    @property
+    def throughput(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        now = time.monotonic()
+        elapsed = now - self.started_at
+        area = self._window_area + self.window * (now - self._window_changed_at)
+        return {
+            'window': round(self.window, 2),
+            'avg_window': round(area / elapsed, 2) if elapsed > 0 else round(self.window, 2),
+            'min_window': round(self.min_window_seen, 2),
+            'max_window': round(self.max_window_seen, 2),
+            'throughput': round(self.throughput, 2),
+            'completed': self.completed,
+            'throttled': self.throttled,
+            'errors': self.errors,
+            'client_errors': self.client_errors,
+            'decreases': self.decreases,
+            'avg_latency_ms': round((self.avg_latency or 0) * 1000, 1),
+        }
+
+    def log_summary(self):
+        s = self.summary()
+        print(f"📈 Concorrência adaptativa: janela final {s['window']} "
+              f"(média {s['avg_window']}, mín {s['min_window']}, máx {s['max_window']}), "
+              f"{s['throughput']} req/s, {s['completed']} ok / {s['throttled']} 429 / {s['errors']} erros / {s['client_errors']} 4xx, "
+              f"{s['decreases']} reduções, latência média {s['avg_latency_ms']} ms")
+
+
+def concurrency_controller_from_kwargs(kwargs, max_window):
+    """
+    Controlador AIMD a partir das variáveis do bloco (`adaptive_concurrency`,
+    ligado por padrão, e `initial_concurrency`), limitado por `max_window`
+    """
+    if not kwargs.get('adaptive_concurrency', True):
+        return None
+    # Variáveis de runtime do Mage chegam como texto
+    max_window = int(max_window)
+    return AIMDController(
+        max_window=max_window,
+        initial_window=min(int(kwargs.get('initial_concurrency', DEFAULT_INITIAL_WINDOW)), max_window),
+    )
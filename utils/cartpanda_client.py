@@ -0,0 +1,267 @@
+"""
+Cliente HTTP da API CartPanda compartilhado pelos loaders de pedidos e clientes.
+
+- Uma `aiohttp.ClientSession` com pool keep-alive por host
+- Timeout por requisição
+- Retentativas por página com backoff exponencial e jitter (erros de rede,
+  timeouts, 5xx e 429)
+- Circuit breaker por loja: após falhas seguidas, a loja para de ser chamada
+  por um tempo em vez de martelar uma API instável
+- Cache opcional de páginas em disco (`utils.page_cache`)
+- Controle adaptativo (AIMD) opcional de requisições simultâneas
+  (`utils.adaptive_concurrency`)
+- Decodificação tipada opcional das páginas (`utils.cartpanda_decode`)
+"""
+import asyncio
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from utils.adaptive_concurrency import (
+    OUTCOME_CLIENT_ERROR,
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    OUTCOME_THROTTLED,
+)
+from utils.rate_limiter import get_rate_limiter_for_headers
+
+# Sobrescrevível por variável de ambiente (ex.: API simulada de benchmarks/)
+CARTPANDA_BASE_URL = os.getenv('CARTPANDA_BASE_URL', 'https://accounts.cartpanda.com/api/v3')
+PAGE_LIMIT = 200
+
+# Timeouts por requisição (segundos)
+REQUEST_TIMEOUT = 30
+CONNECT_TIMEOUT = 10
+
+# Retentativas por página
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Circuit breaker por loja
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 60.0
+
+POOL_SIZE = 10
+KEEPALIVE_TIMEOUT = 60
+
+
+class CircuitOpenError(Exception):
+    """Loja com circuit breaker aberto: requisições suspensas temporariamente"""
+
+
+class CartPandaHTTPError(Exception):
+    """Página que falhou mesmo após todas as retentativas"""
+
+    def __init__(self, slug, page, status, message):
+        super().__init__(f"{slug} página {page}: HTTP {status} - {message}")
+        self.slug = slug
+        self.page = page
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples (fechado → aberto → meio-aberto).
+    Abre após `failure_threshold` falhas seguidas e libera uma única requisição
+    de teste depois de `reset_timeout` segundos; as demais são recusadas até a
+    de teste fechar (sucesso) ou reabrir (falha) o circuito.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'open' or self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Libera a requisição de teste que terminou sem sucesso nem falha (ex.: 429)"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, maximum=BACKOFF_MAX):
+    """
+    Backoff exponencial com jitter ("full jitter"): aleatório entre 0 e base * 2^tentativa
+    """
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+class CartPandaClient:
+    """
+    Uso:
+
+        async with CartPandaClient(headers) as client:
+            data = await client.get_page('vita-waves', 'orders', {'updated_at_min': ...}, page=1)
+    """
+
+    def __init__(self, headers, rate_limiter=None, base_url=None, pool_size=POOL_SIZE,
+                 max_retries=MAX_RETRIES, request_timeout=REQUEST_TIMEOUT, page_cache=None,
+                 concurrency_controller=None, decoder=None):
+        self.headers = headers
+        self.rate_limiter = rate_limiter or get_rate_limiter_for_headers(headers)
+        self.base_url = base_url or CARTPANDA_BASE_URL
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=request_timeout, connect=CONNECT_TIMEOUT)
+        self.page_cache = page_cache
+        self.concurrency_controller = concurrency_controller
+        self.decoder = decoder
+        self._sessions = {}
+        self._breakers = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    def build_url(self, slug, endpoint):
+        return f'{self.base_url}/{slug}/{endpoint}'
+
+    def _session_for(self, url):
+        # Uma sessão (pool de conexões keep-alive) por host
+        host = urlsplit(url).netloc
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._sessions[host] = session
+        return session
+
+    def breaker_for(self, slug):
+        breaker = self._breakers.get(slug)
+        if breaker is None:
+            breaker = self._breakers[slug] = CircuitBreaker()
+        return breaker
+
+    async def get_page(self, slug, endpoint, params=None, page=1):
+        """
+        Busca uma página (do cache em disco, se ativo, ou da API)
+        """
+        if self.page_cache is None:
+            return await self.fetch_page(slug, endpoint, params, page)
+
+        data = await asyncio.to_thread(self.page_cache.get, slug, endpoint, params, page)
+        if data is not None and self.decoder is not None:
+            data = self.decoder.decode_page(endpoint, self.decoder.encode_page(data))
+        if data is None:
+            data = await self.fetch_page(slug, endpoint, params, page)
+            await asyncio.to_thread(self.page_cache.put, slug, endpoint, params, page, data)
+        return data
+
+    async def fetch_page(self, slug, endpoint, params=None, page=1):
+        """
+        Busca uma página na API com retentativas. Levanta CircuitOpenError se a loja
+        estiver com o circuito aberto e CartPandaHTTPError se esgotar as tentativas.
+        """
+        url = self.build_url(slug, endpoint)
+        page_params = dict(params or {})
+        page_params.update({'page': page, 'limit': PAGE_LIMIT})
+        breaker = self.breaker_for(slug)
+        session = self._session_for(url)
+
+        for attempt in range(self.max_retries + 1):
+            probe = breaker.state == 'half-open'
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit breaker aberto para {slug} (página {page})")
+
+            await self.rate_limiter.acquire_async()
+            if self.concurrency_controller is not None:
+                await self.concurrency_controller.acquire()
+            started = time.monotonic()
+            outcome = OUTCOME_OK
+            try:
+                async with session.get(url, headers=self.headers, params=page_params) as response:
+                    if response.status < 400:
+                        if self.decoder is not None:
+                            data = self.decoder.decode_page(endpoint, await response.read())
+                        else:
+                            data = await response.json(content_type=None)
+                        breaker.record_success()
+                        return data
+
+                    status = response.status
+                    message = response.reason
+                    retry_after = response.headers.get('Retry-After')
+                    if status == 429:
+                        outcome = OUTCOME_THROTTLED
+                    elif status in RETRYABLE_STATUS:
+                        outcome = OUTCOME_ERROR
+                    else:
+                        outcome = OUTCOME_CLIENT_ERROR
+
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError) as e:
+                status = None
+                message = repr(e)
+                retry_after = None
+                outcome = OUTCOME_ERROR
+
+            finally:
+                if probe:
+                    breaker.release_probe()
+                if self.concurrency_controller is not None:
+                    self.concurrency_controller.release(time.monotonic() - started, outcome)
+
+            if status is not None and status not in RETRYABLE_STATUS:
+                raise CartPandaHTTPError(slug, page, status, message)
+
+            if status == 429:
+                # Throttling é da API key, não da loja: não conta no breaker
+                delay = self.rate_limiter.penalize(retry_after)
+            else:
+                breaker.record_failure()
+                delay = backoff_delay(attempt)
+
+            if attempt == self.max_retries:
+                break
+            if breaker.state == 'open':
+                raise CircuitOpenError(f"Circuit breaker aberto para {slug} (página {page})")
+
+            print(f"⏳ {slug} | Página {page}: {status or message}, "
+                  f"tentativa {attempt + 1}/{self.max_retries} em {delay:.1f}s")
+            if status != 429:
+                await asyncio.sleep(delay)
+
+        raise CartPandaHTTPError(slug, page, status, message)
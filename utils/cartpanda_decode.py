@@ -0,0 +1,194 @@
+"""
+Decodificação tipada (opcional) das páginas de pedidos da API CartPanda com msgspec.
+
+Em vez de `response.json()` montar o dict completo de cada pedido, os bytes da
+resposta são decodificados direto em structs com slots (`Order`, `LineItem`,
+...) que guardam só os campos de `ORDER_FIELDS` e do mapeamento de itens:
+
+- Campos escalares viram objetos Python normais
+- Objetos aninhados selecionados (`client_details`, `*_set`, `tax_lines`, ...)
+  ficam como `msgspec.Raw` (bytes JSON, sem montar a árvore) até a transformação
+- O pedido inteiro fica disponível em `order.raw` (bytes JSON originais), então
+  campos que não estão nas structs continuam acessíveis (`decode_raw(order.raw)`)
+- Pedidos com formato inesperado (falha de validação) caem no dict genérico
+
+Ativado pela variável de bloco `typed_decoding` (requer `pip install msgspec`);
+sem msgspec os loaders seguem com `response.json()`.
+"""
+try:
+    import msgspec
+except ImportError:  # dependência opcional
+    msgspec = None
+
+from utils.cartpanda_transform import ORDER_FIELDS
+
+# Objetos aninhados de ORDER_FIELDS mantidos como JSON bruto
+RAW_ORDER_FIELDS = {
+    'client_details', 'note_attributes', 'payment_details', 'tax_lines',
+    'local_currency_total_discounts_set',
+}
+
+# Campos de line_items usados em ITEM_COLUMNS
+LINE_ITEM_FIELDS = [
+    'id', 'name', 'title', 'local_currency_item_total_price', 'quantity', 'sku',
+    'vendor', 'currency_symbol', 'total_price', 'product_main_image',
+]
+
+# Colunas calculadas na transformação (não vêm da API)
+COMPUTED_ORDER_FIELDS = {'shop_slug', 'discount_codes_local_currency_discount_amount'}
+
+TYPED_ENDPOINTS = {'orders'}
+
+
+def _is_raw_field(name):
+    return name in RAW_ORDER_FIELDS or name.endswith('_set')
+
+
+def _build_structs():
+    """
+    Cria as structs a partir de ORDER_FIELDS: campos "a.b" viram uma struct
+    aninhada `a` com o campo `b`
+    """
+    UNSET = msgspec.UNSET
+    options = dict(omit_defaults=True, gc=False)
+
+    top_level = []
+    nested = {}
+    for field in ORDER_FIELDS:
+        if field in COMPUTED_ORDER_FIELDS:
+            continue
+        if '.' in field:
+            parent, child = field.split('.', 1)
+            if parent not in nested:
+                nested[parent] = []
+                top_level.append(parent)
+            nested[parent].append(child)
+        else:
+            top_level.append(field)
+
+    order_fields = []
+    for name in top_level:
+        if name in nested:
+            struct = msgspec.defstruct(
+                ''.join(part.title() for part in name.split('_')),
+                [(child, object, None) for child in nested[name]],
+                **options,
+            )
+            order_fields.append((name, struct | None, UNSET))
+        elif _is_raw_field(name):
+            order_fields.append((name, msgspec.Raw, UNSET))
+        else:
+            order_fields.append((name, object, UNSET))
+
+    line_item = msgspec.defstruct(
+        'LineItem', [(name, object, None) for name in LINE_ITEM_FIELDS], **options
+    )
+    discount_code = msgspec.defstruct(
+        'DiscountCode', [('local_currency_discount_amount', object, None)], **options
+    )
+    order_fields += [
+        ('line_items', list[line_item] | None, UNSET),
+        ('discount_codes', list[discount_code] | None, UNSET),
+        ('shop_slug', object, None),
+        ('raw', msgspec.Raw, msgspec.field(default=msgspec.Raw(b'{}'), name='__raw__')),
+    ]
+    order = msgspec.defstruct('Order', order_fields, **options)
+    return order, line_item, discount_code
+
+
+if msgspec is not None:
+    Order, LineItem, DiscountCode = _build_structs()
+else:
+    Order = LineItem = DiscountCode = None
+
+
+class OrderDecoder:
+    """
+    Decodifica o corpo de uma página ({endpoint: [...], 'meta': {...}}).
+    Pedidos viram `Order`; outros endpoints usam o decoder JSON genérico do msgspec.
+    """
+
+    def __init__(self):
+        if msgspec is None:
+            raise ImportError("msgspec não está instalado (pip install msgspec)")
+        self._page_decoders = {
+            endpoint: msgspec.json.Decoder(msgspec.defstruct(
+                f'{endpoint.title()}Page',
+                [(endpoint, list[msgspec.Raw], []), ('meta', object, None)],
+            ))
+            for endpoint in TYPED_ENDPOINTS
+        }
+        self._order_decoder = msgspec.json.Decoder(Order)
+        self._generic_decoder = msgspec.json.Decoder()
+
+    def decode_page(self, endpoint, body):
+        page_decoder = self._page_decoders.get(endpoint)
+        if page_decoder is None:
+            return self._generic_decoder.decode(body)
+
+        page = page_decoder.decode(body)
+        records = []
+        for raw in getattr(page, endpoint):
+            try:
+                order = self._order_decoder.decode(raw)
+            except msgspec.ValidationError:
+                # Formato inesperado (ex.: objeto aninhado vindo como lista): dict genérico
+                records.append(self._generic_decoder.decode(raw))
+                continue
+            order.raw = raw
+            records.append(order)
+        return {endpoint: records, 'meta': page.meta}
+
+    def encode_page(self, data):
+        """Bytes JSON de uma página já decodificada como dicts (ex.: cache em disco)"""
+        return msgspec.json.encode(data)
+
+
+def decode_raw(raw):
+    """Objeto Python de um campo `msgspec.Raw`"""
+    return msgspec.json.decode(raw)
+
+
+def is_typed_order(record):
+    return Order is not None and isinstance(record, Order)
+
+
+def order_to_dict(order):
+    """
+    Converte um `Order` no dict aninhado equivalente ao da API, só com os campos
+    selecionados (mesmas colunas em `pd.json_normalize`)
+    """
+    result = {}
+    for name in order.__struct_fields__:
+        if name == 'raw':
+            continue
+        value = getattr(order, name)
+        if value is msgspec.UNSET:
+            continue
+        if isinstance(value, msgspec.Raw):
+            value = msgspec.json.decode(value)
+        elif isinstance(value, list):
+            value = [msgspec.structs.asdict(item) if isinstance(item, msgspec.Struct) else item
+                     for item in value]
+        elif isinstance(value, msgspec.Struct):
+            value = msgspec.structs.asdict(value)
+        result[name] = value
+    return result
+
+
+def record_to_dict(record):
+    return order_to_dict(record) if is_typed_order(record) else record
+
+
+def typed_decoder_from_kwargs(kwargs):
+    """
+    Decoder tipado se a variável de bloco `typed_decoding` estiver ligada e o
+    msgspec instalado; senão None (`response.json()`)
+    """
+    if not kwargs.get('typed_decoding'):
+        return None
+    if msgspec is None:
+        print("⚠️ typed_decoding ativo mas msgspec não está instalado; usando response.json()")
+        return None
+    print("🧬 Decodificação tipada de pedidos ativa (msgspec)")
+    return OrderDecoder()
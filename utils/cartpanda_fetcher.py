@@ -0,0 +1,98 @@
+"""
+Busca assíncrona de páginas da API CartPanda.
+
+As páginas de todas as lojas são distribuídas por um pool global de workers
+(`utils.page_scheduler.PageScheduler`) através do `CartPandaClient` (pool
+keep-alive, retentativas, circuit breaker). A vazão é limitada pelo token
+bucket compartilhado da API key (`utils.rate_limiter`).
+"""
+import asyncio
+import threading
+
+from utils.cartpanda_client import CartPandaClient
+from utils.page_scheduler import PageScheduler
+
+# Tamanho do pool global de workers (requisições simultâneas, todas as lojas somadas)
+DEFAULT_GLOBAL_CONCURRENCY = 10
+
+# Limite opcional de requisições simultâneas por loja; None deixa o scheduler
+# distribuir o pool global conforme o backlog de cada loja
+DEFAULT_PER_SHOP_CONCURRENCY = None
+
+
+async def fetch_records_for_slugs_async(slugs, endpoint, headers, params=None,
+                                        per_shop_concurrency=DEFAULT_PER_SHOP_CONCURRENCY,
+                                        global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                                        rate_limiter=None, params_by_slug=None, page_cache=None, concurrency_controller=None, decoder=None):
+    """
+    Busca todas as lojas com um pool global de `global_concurrency` workers.
+    `params_by_slug` permite filtros diferentes por loja (ex.: updated_at_min);
+    lojas ausentes nele usam `params`.
+    Retorna {slug: lista de registros ou Exception}, para que a falha de uma
+    loja não derrube as demais.
+    """
+    records_by_slug = {slug: [] for slug in slugs}
+
+    def on_page(slug, page, records):
+        records_by_slug[slug].extend(records)
+
+    async with CartPandaClient(
+        headers, rate_limiter, pool_size=global_concurrency, page_cache=page_cache,
+        concurrency_controller=concurrency_controller, decoder=decoder,
+    ) as client:
+        errors = await PageScheduler(
+            client, endpoint, slugs, on_page,
+            workers=global_concurrency,
+            params=params,
+            params_by_slug=params_by_slug,
+            per_shop_limit=per_shop_concurrency,
+        ).run()
+
+    return {slug: errors.get(slug, records) for slug, records in records_by_slug.items()}
+
+
+def run_sync(coroutine):
+    """
+    Executa uma corrotina a partir de código síncrono (blocos do Mage).
+    Se já houver um event loop rodando nesta thread (ex.: notebook), executa
+    em uma thread separada.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    result = {}
+
+    def runner():
+        try:
+            result['value'] = asyncio.run(coroutine)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+def fetch_records_for_slugs(slugs, endpoint, headers, params=None,
+                            per_shop_concurrency=DEFAULT_PER_SHOP_CONCURRENCY,
+                            global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                            rate_limiter=None, params_by_slug=None, page_cache=None, concurrency_controller=None, decoder=None):
+    """
+    Versão síncrona de `fetch_records_for_slugs_async`
+    """
+    return run_sync(fetch_records_for_slugs_async(
+        slugs, endpoint, headers, params,
+        per_shop_concurrency=per_shop_concurrency,
+        global_concurrency=global_concurrency,
+        rate_limiter=rate_limiter,
+        params_by_slug=params_by_slug,
+        page_cache=page_cache,
+        concurrency_controller=concurrency_controller,
+        decoder=decoder,
+    ))
@@ -0,0 +1,157 @@
+"""
+Transformação de pedidos em paralelo (vários processos) para cargas completas.
+
+A lista de pedidos é dividida em shards (por loja ou em blocos de tamanho fixo)
+transformados por `transform_orders` num pool de processos. Com o start method
+`fork` (Linux, host do Mage) os workers herdam a lista de pedidos e recebem só
+os índices do shard, sem serializar os pedidos. Os DataFrames dos shards são
+concatenados no final (colunas Arrow só juntam os chunks, sem copiar).
+
+Abaixo de `min_orders` pedidos segue tudo no processo atual.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+from utils.cartpanda_transform import (
+    ITEM_COLUMN_TYPES,
+    ORDER_COLUMN_TYPES,
+    ORDER_FIELDS,
+    transform_orders,
+)
+from utils.column_types import to_typed_frame
+
+DEFAULT_MIN_ORDERS = 50_000
+DEFAULT_SHARD_SIZE = 20_000
+SHARD_MODES = ('size', 'shop')
+
+# Pedidos herdados pelos workers (fork)
+_shared_orders = None
+
+
+def _transform_shard(shard, typed):
+    """
+    Worker: `shard` são índices em `_shared_orders` (fork) ou os próprios pedidos
+    """
+    orders = [_shared_orders[index] for index in shard] if _shared_orders is not None else shard
+    return transform_orders(orders, verbose=False, typed=typed)
+
+
+def shard_indices(all_orders, shard_by='size', shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Índices de cada shard: blocos de `shard_size` pedidos, ou um shard por loja
+    (`shop_slug`, lojas grandes divididas em blocos de `shard_size`)
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f"shard_by deve ser um de {SHARD_MODES}, recebido: {shard_by!r}")
+
+    if shard_by == 'size':
+        return [range(start, min(start + shard_size, len(all_orders)))
+                for start in range(0, len(all_orders), shard_size)]
+
+    by_shop = {}
+    for index, order in enumerate(all_orders):
+        slug = order.get('shop_slug') if isinstance(order, dict) else getattr(order, 'shop_slug', None)
+        by_shop.setdefault(slug, []).append(index)
+    return [indices[start:start + shard_size]
+            for indices in by_shop.values()
+            for start in range(0, len(indices), shard_size)]
+
+
+def _align_columns(frames, column_order, column_types):
+    """
+    Mesmas colunas (na ordem de `column_order`) em todos os shards: colunas
+    ausentes num shard entram com nulos do tipo declarado
+    """
+    present = set().union(*(frame.columns for frame in frames))
+    columns = [col for col in column_order if col in present]
+    columns += [col for col in present if col not in columns]
+
+    aligned = []
+    for frame in frames:
+        # Shards já alinhados seguem intactos; os demais são reindexados sem copiar as colunas
+        if list(frame.columns) != columns:
+            missing = [col for col in columns if col not in frame.columns]
+            frame = frame.reindex(columns=columns, copy=False)
+            if missing:
+                filler = to_typed_frame({col: [None] * len(frame) for col in missing}, column_types, len(frame))
+                for col in missing:
+                    frame[col] = filler[col].set_axis(frame.index)
+        aligned.append(frame)
+    return aligned
+
+
+def _concat(frames, column_order, column_types):
+    frames = [frame for frame in frames if len(frame.columns)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(_align_columns(frames, column_order, column_types), ignore_index=True, copy=False)
+
+
+def transform_orders_parallel(all_orders, workers=None, shard_by='size', shard_size=DEFAULT_SHARD_SIZE,
+                              min_orders=DEFAULT_MIN_ORDERS, typed=True, verbose=True):
+    """
+    Mesmo resultado de `transform_orders`, transformando shards em paralelo
+    quando há pelo menos `min_orders` pedidos
+    """
+    global _shared_orders
+
+    all_orders = all_orders if isinstance(all_orders, list) else list(all_orders)
+    workers = workers or os.cpu_count() or 1
+    if len(all_orders) < min_orders or workers < 2:
+        return transform_orders(all_orders, verbose=verbose, typed=typed)
+
+    shards = shard_indices(all_orders, shard_by, shard_size)
+    workers = min(workers, len(shards))
+    use_fork = 'fork' in multiprocessing.get_all_start_methods()
+    print(f"🧵 Transformando {len(all_orders)} pedidos em {len(shards)} shards "
+          f"({shard_by}) com {workers} processos")
+
+    if use_fork:
+        _shared_orders = all_orders
+        context = multiprocessing.get_context('fork')
+        tasks = shards
+    else:
+        context = None
+        tasks = [[all_orders[index] for index in shard] for shard in shards]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = list(pool.map(_transform_shard, tasks, [typed] * len(tasks)))
+    finally:
+        _shared_orders = None
+
+    df_orders = _concat([orders for orders, _ in results], ORDER_FIELDS + ['ultima_atualizacao'],
+                        ORDER_COLUMN_TYPES)
+    df_items = _concat([items for _, items in results], list(ITEM_COLUMN_TYPES), ITEM_COLUMN_TYPES)
+
+    # Duplicatas entre shards e um único horário de atualização para a carga
+    if not df_orders.empty:
+        initial_count = len(df_orders)
+        df_orders = df_orders.drop_duplicates(subset=['id'])
+        if verbose and initial_count > len(df_orders):
+            print(f"🧹 Removidas {initial_count - len(df_orders)} duplicatas por ID entre shards")
+        df_orders['ultima_atualizacao'] = datetime.now(pytz.timezone('America/Sao_Paulo'))
+
+    if verbose:
+        print(f"✅ DataFrame de pedidos criado com {len(df_orders)} registros")
+        print(f"✅ DataFrame de itens criado com {len(df_items)} produtos")
+    return df_orders, df_items
+
+
+def parallel_options_from_kwargs(kwargs):
+    """
+    Opções de `transform_orders_parallel` a partir das variáveis de bloco:
+    `transform_workers` (0/1 desliga), `transform_shard_by` ('size' ou 'shop'),
+    `transform_shard_size` e `transform_min_orders`
+    """
+    return {
+        'workers': int(kwargs['transform_workers']) if kwargs.get('transform_workers') is not None else None,
+        'shard_by': kwargs.get('transform_shard_by') or 'size',
+        'shard_size': int(kwargs.get('transform_shard_size') or DEFAULT_SHARD_SIZE),
+        'min_orders': int(kwargs.get('transform_min_orders') or DEFAULT_MIN_ORDERS),
+    }
@@ -0,0 +1,275 @@
+"""
+Modo streaming: extrai → transforma → faz upsert em lotes de tamanho fixo.
+
+As páginas de todas as lojas entram numa fila limitada; o consumidor junta os
+pedidos de cada loja em lotes de ~`chunk_size` (páginas inteiras), transforma e
+faz o upsert de cada lote em uma thread enquanto as próximas páginas continuam
+sendo buscadas. O pico de memória fica proporcional ao tamanho do lote, não ao
+histórico inteiro de pedidos.
+"""
+import asyncio
+from datetime import datetime
+
+import pytz
+
+from utils.cartpanda_client import CartPandaClient
+from utils.cartpanda_fetcher import (
+    DEFAULT_GLOBAL_CONCURRENCY,
+    DEFAULT_PER_SHOP_CONCURRENCY,
+    run_sync,
+)
+from utils.cartpanda_transform import ITEM_TABLE_TYPES, ORDER_TABLE_TYPES, transform_orders
+from utils.page_scheduler import PageScheduler
+from utils.postgres import (
+    create_railway_engine,
+    create_replication_engine,
+    ensure_schema,
+    sanitize_for_postgres,
+    upsert_dataframe,
+)
+from utils.row_hash import HASH_COLUMN
+from utils.sync_state import compute_high_water_marks
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Máximo de páginas buscadas aguardando o consumidor
+QUEUE_MAX_PAGES = 10
+
+SCHEMA = 'integracao'
+
+
+async def stream_records_async(slugs, endpoint, headers, on_chunk, chunk_size=DEFAULT_CHUNK_SIZE,
+                               params=None, params_by_slug=None,
+                               per_shop_concurrency=DEFAULT_PER_SHOP_CONCURRENCY,
+                               global_concurrency=DEFAULT_GLOBAL_CONCURRENCY,
+                               rate_limiter=None, start_pages=None, on_commit=None,
+                               page_cache=None, concurrency_controller=None, decoder=None):
+    """
+    Busca as páginas de todas as lojas e chama `on_chunk(registros)` sempre que
+    uma loja acumula `chunk_size` registros. Os lotes são por loja e sempre com
+    páginas inteiras, então após cada lote gravado `on_commit(slug, última_página,
+    finished)` pode registrar um checkpoint exato. `start_pages` ({slug: página})
+    retoma lojas a partir de uma página.
+
+    Retorna {'records': total, 'chunks': n, 'errors': {slug: Exception}}.
+    Erros de busca de uma loja não interrompem as demais (as páginas já
+    recebidas dela ainda são gravadas); erros em `on_chunk` interrompem o streaming.
+    """
+    queue = asyncio.Queue(maxsize=QUEUE_MAX_PAGES)
+    errors = {}
+    summary = {'records': 0, 'chunks': 0, 'errors': errors}
+
+    async with CartPandaClient(
+        headers, rate_limiter, pool_size=global_concurrency, page_cache=page_cache,
+        concurrency_controller=concurrency_controller, decoder=decoder,
+    ) as client:
+
+        async def on_page(slug, page, records):
+            await queue.put(('page', slug, page, records))
+
+        async def on_end(slug, error):
+            if error is not None:
+                errors[slug] = error
+            await queue.put(('end', slug, None, None))
+
+        scheduler = PageScheduler(
+            client, endpoint, slugs, on_page, on_end,
+            workers=global_concurrency,
+            params=params,
+            params_by_slug=params_by_slug,
+            start_pages=start_pages,
+            per_shop_limit=per_shop_concurrency,
+        )
+
+        async def produce_all():
+            try:
+                await scheduler.run()
+            finally:
+                await queue.put(None)
+
+        buffers = {slug: [] for slug in slugs}
+        last_pages = {}
+
+        async def flush(slug, finished=False):
+            chunk = buffers[slug]
+            buffers[slug] = []
+            if chunk:
+                # O upsert roda em thread: a busca das próximas páginas continua em paralelo
+                await asyncio.to_thread(on_chunk, chunk)
+                summary['records'] += len(chunk)
+                summary['chunks'] += 1
+            if on_commit is not None and (chunk or finished):
+                on_commit(slug, last_pages.get(slug), finished)
+
+        producer = asyncio.ensure_future(produce_all())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                kind, slug, page, records = item
+                if kind == 'page':
+                    buffers[slug].extend(records)
+                    last_pages[slug] = page
+                    if len(buffers[slug]) >= chunk_size:
+                        await flush(slug)
+                else:
+                    await flush(slug, finished=slug not in errors)
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    return summary
+
+
+def stream_records(*args, **kwargs):
+    """
+    Versão síncrona de `stream_records_async`
+    """
+    return run_sync(stream_records_async(*args, **kwargs))
+
+
+class OrdersChunkWriter:
+    """
+    Transforma um lote de pedidos e faz upsert de pedidos e itens nos destinos.
+    Destinos não obrigatórios (Railway) podem falhar sem interromper o streaming,
+    como no exporter `postgres_upsert_orders_and_items`.
+    """
+
+    def __init__(self, targets):
+        # targets: lista de (nome, engine, obrigatório)
+        self.targets = targets
+        self.failed_targets = set()
+        self.high_water_marks = {}
+        self.orders_written = 0
+        self.items_written = 0
+
+        for name, engine, required in targets:
+            ensure_schema(engine, SCHEMA)
+
+    def __call__(self, orders):
+        df_orders, df_items = transform_orders(orders, verbose=False)
+        df_orders = sanitize_for_postgres(df_orders, ORDER_TABLE_TYPES)
+        df_items = sanitize_for_postgres(df_items, ITEM_TABLE_TYPES)
+
+        for name, engine, required in self.targets:
+            try:
+                upsert_dataframe(df_orders, 'cartpanda_orders', SCHEMA, engine, 'id',
+                                 ORDER_TABLE_TYPES, HASH_COLUMN)
+                upsert_dataframe(df_items, 'cartpanda_items', SCHEMA, engine, 'item_id',
+                                 ITEM_TABLE_TYPES, HASH_COLUMN)
+            except Exception as e:
+                if required:
+                    raise
+                print(f"❌ Erro no upsert do lote para {name}: {e}")
+                self.failed_targets.add(name)
+
+        for slug, mark in compute_high_water_marks(df_orders, 'shop_slug', 'updated_at').items():
+            if slug not in self.high_water_marks or mark > self.high_water_marks[slug]:
+                self.high_water_marks[slug] = mark
+
+        self.orders_written += len(df_orders)
+        self.items_written += len(df_items)
+        print(f"📤 Lote exportado: {len(df_orders)} pedidos, {len(df_items)} itens "
+              f"(acumulado: {self.orders_written} pedidos)")
+
+
+def default_targets():
+    return [
+        ('Railway', create_railway_engine(), False),
+        ('Replicação', create_replication_engine(), True),
+    ]
+
+
+def full_load_targets(include_replica=False):
+    """
+    Destinos da carga completa: o Railway (obrigatório, como no exporter
+    `postgres_orders_exporter`) e, só se pedido, a Replicação/VPS (opcional)
+    """
+    targets = [('Railway', create_railway_engine(), True)]
+    if include_replica:
+        targets.append(('Replicação', create_replication_engine(), False))
+    return targets
+
+
+def stream_orders_to_postgres(slugs, headers, chunk_size=DEFAULT_CHUNK_SIZE, targets=None, **fetch_kwargs):
+    """
+    Executa o streaming de pedidos direto para o PostgreSQL.
+    Retorna (summary, writer) para o loader registrar estado e montar o retorno do bloco.
+    """
+    writer = OrdersChunkWriter(targets or default_targets())
+    summary = stream_records(slugs, 'orders', headers, writer, chunk_size=chunk_size, **fetch_kwargs)
+    print(f"\n📦 Streaming concluído: {writer.orders_written} pedidos e {writer.items_written} itens "
+          f"em {summary['chunks']} lotes")
+    return summary, writer
+
+
+def stream_orders_with_checkpoint(slugs, headers, checkpoints, reset=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                                  targets=None, **fetch_kwargs):
+    """
+    Carga completa em streaming retomável a partir de `checkpoints`
+    (`utils.checkpoint.CheckpointStore`): lojas concluídas são puladas, as
+    demais recomeçam da página seguinte à última gravada, e o checkpoint avança
+    após cada lote gravado. `reset` descarta o checkpoint antes de começar.
+
+    O checkpoint só é apagado quando a carga termina sem erros; do contrário
+    levanta Exception mantendo-o para a próxima execução retomar.
+    Retorna (summary, writer) como `stream_orders_to_postgres`.
+    """
+    if reset:
+        print("🧹 Checkpoint descartado, recomeçando a carga completa da página 1")
+        checkpoints.clear()
+
+    pending_slugs = []
+    start_pages = {}
+    for slug in slugs:
+        if checkpoints.is_finished(slug):
+            print(f"⏭️  {slug}: já concluída no checkpoint, pulando")
+            continue
+        pending_slugs.append(slug)
+        start_pages[slug] = checkpoints.next_page(slug)
+        if start_pages[slug] > 1:
+            print(f"↩️  {slug}: retomando da página {start_pages[slug]}")
+
+    summary, writer = stream_orders_to_postgres(
+        pending_slugs, headers, chunk_size=chunk_size, targets=targets,
+        start_pages=start_pages, on_commit=checkpoints.commit, **fetch_kwargs,
+    )
+
+    if summary['errors']:
+        # Falha o bloco para o retry_config retomar a partir do checkpoint
+        raise Exception(
+            f"Carga completa incompleta para {sorted(summary['errors'])}; "
+            f"checkpoint salvo em {checkpoints.path}"
+        )
+
+    if 'Railway' in writer.failed_targets:
+        # Não limpa o checkpoint: os lotes não gravados no Railway seriam perdidos
+        raise Exception(
+            f"Falha no upsert para o Railway; checkpoint mantido em {checkpoints.path}"
+        )
+    if writer.failed_targets:
+        print(f"⚠️ Lotes não gravados em: {sorted(writer.failed_targets)}")
+
+    # Carga concluída: a próxima carga completa começa do zero
+    checkpoints.clear()
+    return summary, writer
+
+
+def streaming_execution_metadata(summary):
+    """
+    Retorno do loader em modo streaming: sinaliza aos blocos seguintes que não há
+    dados a processar (já foram exportados lote a lote)
+    """
+    brazil_time = datetime.now(pytz.timezone('America/Sao_Paulo'))
+    return {
+        'execution_metadata': {
+            'has_data': False,
+            'streaming': True,
+            'extraction_timestamp': brazil_time.isoformat(),
+            'extraction_date': brazil_time.strftime('%d/%m/%Y'),
+            'message': f"Modo streaming: {summary['records']} registros já exportados em {summary['chunks']} lotes"
+        },
+        'orders': [],
+        'total_orders': summary['records']
+    }
@@ -0,0 +1,247 @@
+"""
+Transformação de pedidos CartPanda em DataFrames de pedidos e itens.
+
+Compartilhado pelos transformers (`transformer_orders`, `transformers_cartpanda_orders_v2`)
+e pelo modo streaming dos loaders, que transforma cada lote antes do upsert.
+"""
+import numpy as np
+from datetime import datetime
+import pytz
+
+from utils.column_types import parse_money, postgres_column_types, to_typed_frame
+from utils.field_extractor import FieldExtractor
+from utils.row_hash import HASH_COLUMN, content_hash
+
+# Campos principais da tabela de pedidos
+ORDER_FIELDS = [
+    "id","status_id", "browser_ip", "buyer_accepts_marketing", "buyer_accepts_phone_marketing",
+    "cancel_reason", "cancelled_at", "cart_token", "client_details", "closed_at",
+    "contact_email", "created_at", "currency", "local_currency_amount",
+    "local_currency_amount_without_tax", "local_currency_subtotal_price",
+    "local_currency_total_discounts_set", "currency_symbol", "current_total_discounts",
+    "current_total_discounts_set", "current_total_price", "current_total_price_set",
+    "current_subtotal_price", "current_subtotal_price_set", "current_total_tax",
+    "current_total_tax_set", "customer_locale", "email",
+    "financial_status", "fulfillment_status", "landing_site", "location_id", "name",
+    "note", "custom_notes", "note_attributes", "number", "order_number",
+    "order_status_url", "payment.gateway","payment.payment_type","payment_details", "payment_brand", "phone",
+    "presentment_currency", "processed_at", "processing_method", "referring_site",
+    "source_name", "subtotal_price", "subtotal_price_set", "tags", "tax_lines",
+    "taxes_included", "test", "token", "total_discounts", "total_discounts_set",
+    "total_line_items_price", "total_line_items_price_set", "total_price",
+    "total_price_set", "total_tax", "local_currency_total_tax", "total_tax_set",
+    "total_price_without_tax", "total_tip_received", "total_weight", "updated_at",
+    "customer.id","customer.first_name","customer.last_name", "shop_slug", "shipping_address.country",
+    "shipping_address.house_no","shipping_address.address","shipping_address.province_code",
+    "shipping_address.zip", "shipping_address.country_code", "shipping_address.city",
+    "shipping_address.neighborhood","shipping_address.phone", "shipping_lines.local_currency_shipping_price",
+    "discount_codes_local_currency_discount_amount"  # Campo customizado que vamos criar
+]
+
+# Extrator compilado dos caminhos de ORDER_FIELDS (substitui json_normalize + filtro)
+ORDER_EXTRACTOR = FieldExtractor(
+    [field for field in ORDER_FIELDS if field != 'discount_codes_local_currency_discount_amount']
+)
+
+# Colunas da tabela de itens (line_items)
+ITEM_COLUMNS = [
+    "order_id", "item_id", "product_name", "title", "price", "quantity",
+    "sku", "vendor", "currency_symbol", "total_price", "product_main_image", "shop_slug"
+]
+
+
+# Schema declarado das tabelas cartpanda_orders / cartpanda_items (rótulos de
+# utils.column_types): define os tipos Arrow dos DataFrames, o DDL/casts no
+# PostgreSQL (ORDER_TABLE_TYPES / ITEM_TABLE_TYPES) e as colunas dos DataFrames vazios
+_ORDER_TYPE_GROUPS = {
+    **dict.fromkeys([
+        "id", "status_id", "location_id", "number", "order_number", "customer.id",
+    ], 'int64'),
+    **dict.fromkeys([
+        "local_currency_amount", "local_currency_amount_without_tax", "local_currency_subtotal_price",
+        "current_total_discounts", "current_total_price", "current_subtotal_price", "current_total_tax",
+        "subtotal_price", "total_discounts", "total_line_items_price", "total_price", "total_tax",
+        "local_currency_total_tax", "total_price_without_tax", "total_tip_received", "total_weight",
+        "shipping_lines.local_currency_shipping_price", "discount_codes_local_currency_discount_amount",
+    ], 'numeric'),
+    **dict.fromkeys([
+        "buyer_accepts_marketing", "buyer_accepts_phone_marketing", "taxes_included", "test",
+    ], 'bool'),
+    **dict.fromkeys([
+        "created_at", "updated_at", "cancelled_at", "closed_at", "processed_at", "ultima_atualizacao",
+    ], 'timestamptz'),
+    HASH_COLUMN: 'int64',
+    **dict.fromkeys([
+        "shop_slug", "financial_status", "fulfillment_status", "currency", "currency_symbol",
+        "presentment_currency", "payment.gateway", "payment.payment_type",
+    ], 'category'),
+    **dict.fromkeys([
+        "browser_ip", "cancel_reason", "cart_token", "contact_email", "customer_locale", "email",
+        "landing_site", "name", "note", "custom_notes", "order_status_url", "payment_brand", "phone",
+        "processing_method", "referring_site", "source_name", "tags", "token",
+        "customer.first_name", "customer.last_name", "shipping_address.country",
+        "shipping_address.house_no", "shipping_address.address", "shipping_address.province_code",
+        "shipping_address.zip", "shipping_address.country_code", "shipping_address.city",
+        "shipping_address.neighborhood", "shipping_address.phone",
+    ], 'string'),
+    **dict.fromkeys([
+        "client_details", "note_attributes", "payment_details", "tax_lines",
+        "local_currency_total_discounts_set", "current_total_discounts_set", "current_total_price_set",
+        "current_subtotal_price_set", "current_total_tax_set", "subtotal_price_set",
+        "total_discounts_set", "total_line_items_price_set", "total_price_set", "total_tax_set",
+    ], 'json'),
+}
+
+# Todas as colunas de pedidos, na ordem da tabela
+ORDER_COLUMN_TYPES = {
+    column: _ORDER_TYPE_GROUPS[column] for column in ORDER_FIELDS + ["ultima_atualizacao", HASH_COLUMN]
+}
+
+ITEM_COLUMN_TYPES = {
+    "order_id": 'int64', "item_id": 'int64', "product_name": 'string', "title": 'string',
+    "price": 'numeric', "quantity": 'int64', "sku": 'string', "vendor": 'category',
+    "currency_symbol": 'category', "total_price": 'numeric', "product_main_image": 'string',
+    "shop_slug": 'category', HASH_COLUMN: 'int64',
+}
+
+ORDER_TABLE_TYPES = postgres_column_types(ORDER_COLUMN_TYPES)
+ITEM_TABLE_TYPES = postgres_column_types(ITEM_COLUMN_TYPES)
+
+
+# Colunas cobertas pelo hash de conteúdo, em ordem fixa
+ORDER_HASH_COLUMNS = [col for col in ORDER_COLUMN_TYPES if col not in ('ultima_atualizacao', HASH_COLUMN)]
+ITEM_HASH_COLUMNS = [col for col in ITEM_COLUMN_TYPES if col != HASH_COLUMN]
+
+
+def empty_orders_df():
+    return to_typed_frame({column: [] for column in ORDER_COLUMN_TYPES}, ORDER_COLUMN_TYPES, 0)
+
+
+def empty_items_df():
+    return to_typed_frame({column: [] for column in ITEM_COLUMN_TYPES}, ITEM_COLUMN_TYPES, 0)
+
+
+def sum_discounts_by_order(order_positions, amounts, size):
+    """
+    Soma os descontos de cada pedido: os valores dos códigos promocionais de
+    todos os pedidos são convertidos em lote (parse_money) e agregados pela
+    posição do pedido
+    """
+    if not order_positions:
+        return np.zeros(size)
+    parsed = np.nan_to_num(parse_money(amounts), nan=0.0)
+    return np.bincount(order_positions, weights=parsed, minlength=size)
+
+
+def extract_order_and_item_columns(all_orders):
+    """
+    Uma única passada pelos pedidos preenchendo, juntos, os buffers das colunas
+    de pedidos (pré-alocados), os valores de desconto (achatados, um por código
+    promocional) e as colunas dos itens.
+    Retorna ({coluna: valores} dos pedidos, {coluna: valores} dos itens).
+    """
+    size = len(all_orders)
+    order_buffers = ORDER_EXTRACTOR.new_buffers(size)
+    discount_positions = []
+    discount_amounts = []
+    slugs = [None] * size
+    item_columns = {column: [] for column in ITEM_COLUMNS}
+    (add_order_id, add_item_id, add_product_name, add_title, add_price, add_quantity,
+     add_sku, add_vendor, add_currency_symbol, add_total_price, add_product_main_image,
+     add_shop_slug) = [item_columns[column].append for column in ITEM_COLUMNS]
+    # Import local: utils.cartpanda_decode importa ORDER_FIELDS deste módulo
+    from utils.cartpanda_decode import record_to_dict
+
+    for index, order in enumerate(all_orders):
+        # Pedidos da decodificação tipada (structs msgspec) viram dicts só com os campos selecionados
+        if not isinstance(order, dict):
+            order = record_to_dict(order)
+
+        ORDER_EXTRACTOR.fill(order_buffers, index, order)
+        discount_codes = order.get("discount_codes")
+        if isinstance(discount_codes, list):
+            for discount in discount_codes:
+                if isinstance(discount, dict):
+                    amount = discount.get("local_currency_discount_amount")
+                    if amount:
+                        discount_positions.append(index)
+                        discount_amounts.append(amount)
+
+        order_id = order.get("id")
+        slug = slugs[index] = order.get("shop_slug")  # leva o slug para os produtos também
+
+        for item in order.get("line_items") or ():
+            add_order_id(order_id)
+            add_item_id(item.get("id"))
+            add_product_name(item.get("name"))
+            add_title(item.get("title"))
+            add_price(item.get("local_currency_item_total_price"))
+            add_quantity(item.get("quantity"))
+            add_sku(item.get("sku"))
+            add_vendor(item.get("vendor"))
+            add_currency_symbol(item.get("currency_symbol"))
+            add_total_price(item.get("total_price"))
+            add_product_main_image(item.get("product_main_image"))
+            add_shop_slug(slug)
+
+    order_columns = ORDER_EXTRACTOR.finish(order_buffers)
+    if 'shop_slug' not in order_columns:
+        order_columns['shop_slug'] = slugs
+    order_columns['discount_codes_local_currency_discount_amount'] = sum_discounts_by_order(
+        discount_positions, discount_amounts, size
+    )
+    return order_columns, item_columns
+
+
+def transform_orders(all_orders, verbose=True, typed=True):
+    """
+    Transforma uma lista de pedidos (dicts da API) em (df_orders, df_items).
+    Com `typed` (e pyarrow instalado) as colunas seguem ORDER_COLUMN_TYPES /
+    ITEM_COLUMN_TYPES em tipos Arrow em vez de object.
+    """
+    log = print if verbose else (lambda *a, **k: None)
+    all_orders = all_orders if isinstance(all_orders, list) else list(all_orders)
+
+    # Colunas de pedidos, descontos e itens numa passada só (sem json_normalize)
+    order_columns, item_columns = extract_order_and_item_columns(all_orders)
+
+    # Ordena como em ORDER_FIELDS (só os campos que existem nos pedidos)
+    available_fields = [col for col in ORDER_FIELDS if col in order_columns]
+    df_orders_filtered = to_typed_frame(
+        {col: order_columns[col] for col in available_fields},
+        ORDER_COLUMN_TYPES if typed else {},
+        len(all_orders),
+    )
+    log(f"✅ DataFrame de pedidos criado com {len(df_orders_filtered)} registros")
+    log(f"🔧 Filtrados {len(available_fields)} campos disponíveis de {len(ORDER_FIELDS)} solicitados")
+
+    # Remove pedidos com IDs nulos
+    initial_count = len(df_orders_filtered)
+    df_orders_filtered = df_orders_filtered.dropna(subset=['id'])
+    removed_null_ids = initial_count - len(df_orders_filtered)
+    if removed_null_ids > 0:
+        log(f"🧹 Removidos {removed_null_ids} pedidos com ID nulo")
+
+    # Cria coluna de última atualização
+    saopaulo_tz = pytz.timezone('America/Sao_Paulo')
+    df_orders_filtered = df_orders_filtered.assign(ultima_atualizacao=datetime.now(saopaulo_tz))
+
+    # Remove duplicatas por ID
+    initial_count = len(df_orders_filtered)
+    df_orders_filtered = df_orders_filtered.drop_duplicates(subset=['id'])
+    removed_duplicates = initial_count - len(df_orders_filtered)
+    if removed_duplicates > 0:
+        log(f"🧹 Removidas {removed_duplicates} duplicatas por ID")
+
+    # Hash do conteúdo bruto (sem ultima_atualizacao) para o upsert pular linhas
+    # inalteradas; o índice do DataFrame é a posição do pedido na lista
+    order_hashes = content_hash(order_columns, ORDER_HASH_COLUMNS, len(all_orders))
+    df_orders_filtered = df_orders_filtered.assign(
+        **{HASH_COLUMN: order_hashes[df_orders_filtered.index.to_numpy()]}
+    )
+
+    df_items = to_typed_frame(item_columns, ITEM_COLUMN_TYPES if typed else {})
+    df_items[HASH_COLUMN] = content_hash(item_columns, ITEM_HASH_COLUMNS, len(df_items))
+    log(f"✅ DataFrame de itens criado com {len(df_items)} produtos")
+
+    return df_orders_filtered, df_items
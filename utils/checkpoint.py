@@ -0,0 +1,76 @@
+"""
+Checkpoints locais (arquivo JSON) para retomar extrações longas.
+
+Cada checkpoint guarda, por chave (slug da loja), a última página já
+transformada e gravada no banco e se a loja terminou. A gravação é atômica
+(arquivo temporário + rename), então uma queda no meio não corrompe o estado.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+CHECKPOINT_DIR = os.getenv(
+    'CARTPANDA_CHECKPOINT_DIR',
+    os.path.join(os.path.expanduser('~'), '.mage_data', 'checkpoints'),
+)
+
+
+class CheckpointStore:
+    """
+    Uso:
+
+        store = CheckpointStore('cartpanda_orders_full')
+        start_page = store.next_page('vita-waves')
+        store.commit('vita-waves', page=12)
+        store.commit('vita-waves', page=40, finished=True)
+    """
+
+    def __init__(self, name, directory=CHECKPOINT_DIR):
+        self.path = os.path.join(directory, f'{name}.json')
+        self._lock = threading.Lock()
+        self._state = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Checkpoint ilegível em {self.path}, recomeçando do zero: {e}")
+            return {}
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        return self._state.get(key, {})
+
+    def is_finished(self, key):
+        return self.get(key).get('finished', False)
+
+    def next_page(self, key):
+        """Página onde a extração da chave deve (re)começar"""
+        return self.get(key).get('last_page', 0) + 1
+
+    def commit(self, key, page, finished=False):
+        with self._lock:
+            entry = self._state.setdefault(key, {})
+            if page is not None:
+                entry['last_page'] = max(entry.get('last_page', 0), page)
+            entry['finished'] = finished
+            entry['updated_at'] = datetime.now().isoformat()
+            self._write()
+
+    def clear(self):
+        with self._lock:
+            self._state = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,164 @@
+"""
+Tipos declarados por coluna: DataFrames tipados com Arrow (pandas `ArrowDtype`)
+e o schema PostgreSQL correspondente.
+
+Os mapas de tipo (ex.: `ORDER_COLUMN_TYPES` em `utils.cartpanda_transform`) usam
+rótulos simples, independentes de biblioteca:
+
+    rótulo          DataFrame                  PostgreSQL
+    'int64'         int64 (Arrow)              BIGINT
+    'numeric'       double (Arrow)             NUMERIC  (ver parse_money)
+    'bool'          bool (Arrow)               BOOLEAN
+    'timestamptz'   timestamp UTC (Arrow)      TIMESTAMPTZ
+    'category'      dicionário (Arrow)         TEXT
+    'string'        string (Arrow)             TEXT
+    'json'          object (dicts/listas)      JSONB
+
+Colunas fora do mapa, ou cujos valores não convertem (ex.: preço vazio ou um
+campo que veio como objeto), ficam como `object`, sem perder dados.
+Sem pyarrow instalado, as colunas seguem como `object`.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # dependência opcional
+    pa = pc = None
+
+# Número decimal com ponto depois da normalização ("1.234,56" → "1234.56")
+_DECIMAL_PATTERN = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+
+def _arrow_type(column_type):
+    return {
+        'int64': pa.int64(),
+        'numeric': pa.float64(),
+        'bool': pa.bool_(),
+        'timestamptz': pa.timestamp('us', tz='UTC'),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'string': pa.string(),
+    }.get(column_type)
+
+
+POSTGRES_TYPES = {
+    'int64': 'BIGINT',
+    'numeric': 'NUMERIC',
+    'bool': 'BOOLEAN',
+    'timestamptz': 'TIMESTAMPTZ',
+    'category': 'TEXT',
+    'string': 'TEXT',
+    'json': 'JSONB',
+}
+
+
+def postgres_column_types(column_types):
+    """{coluna: tipo PostgreSQL} a partir de um mapa de rótulos"""
+    return {column: POSTGRES_TYPES[column_type] for column, column_type in column_types.items()}
+
+
+def _parse_money_value(value):
+    try:
+        if isinstance(value, str):
+            value = value.strip()
+            if value.rfind(',') > value.rfind('.'):
+                # Vírgula decimal ("1.234,56", "1234,56")
+                value = value.replace('.', '').replace(',', '.')
+            else:
+                # Ponto decimal com vírgula de milhar ("1,234.56")
+                value = value.replace(',', '')
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def parse_money(values):
+    """
+    Converte valores monetários em lote para float64 (numpy; NaN se ausente ou
+    inválido). Aceita números e textos com ponto ou vírgula decimal:
+    "1234.56", "1234,56", "1.234,56", "1,234.56". O separador decimal é o
+    último entre ponto e vírgula; o outro é tratado como separador de milhar.
+    Textos que continuam inválidos (ex.: "1,2,3") viram nulo, com a contagem
+    no log.
+    """
+    if pa is None:
+        parsed = np.array([_parse_money_value(value) for value in values], dtype='float64')
+        invalid = sum(1 for value, number in zip(values, parsed)
+                      if np.isnan(number) and isinstance(value, str) and value.strip())
+        if invalid:
+            print(f"⚠️ {invalid} valores monetários inválidos convertidos para nulo")
+        return parsed
+
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Números e textos misturados: tudo como texto
+        array = pa.array([value if value is None or isinstance(value, str) else str(value)
+                          for value in values], type=pa.string(), from_pandas=True)
+
+    if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        return array.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+    array = pc.utf8_trim_whitespace(array)
+    # Posições contadas do fim: a vírgula é decimal se vier depois do último ponto
+    reversed_array = pc.utf8_reverse(array)
+    comma_from_end = pc.find_substring(reversed_array, ',')
+    dot_from_end = pc.find_substring(reversed_array, '.')
+    comma_decimal = pc.and_(
+        pc.greater_equal(comma_from_end, 0),
+        pc.or_(pc.less(dot_from_end, 0), pc.less(comma_from_end, dot_from_end)),
+    )
+    array = pc.if_else(
+        comma_decimal,
+        pc.replace_substring(pc.replace_substring(array, '.', ''), ',', '.'),
+        pc.replace_substring(array, ',', ''),
+    )
+    valid = pc.match_substring_regex(array, _DECIMAL_PATTERN)
+    parsed = pc.if_else(valid, array, pa.scalar(None, pa.string())).cast(pa.float64())
+
+    invalid = pc.sum(pc.and_(pc.invert(valid), pc.not_equal(array, ''))).as_py()
+    if invalid:
+        print(f"⚠️ {invalid} valores monetários inválidos convertidos para nulo")
+    return parsed.to_numpy(zero_copy_only=False)
+
+
+def to_arrow_array(values, column_type):
+    """
+    Array Arrow do tipo declarado, ou None se os valores não convertem
+    """
+    try:
+        if column_type == 'timestamptz':
+            values = pd.Series(values, dtype=object)
+            timestamps = pd.to_datetime(values, utc=True, errors='coerce', format='ISO8601')
+            if timestamps.isna().sum() > values.isna().sum():
+                return None  # algum valor não é uma data válida
+            return pa.array(timestamps, type=_arrow_type(column_type))
+        if column_type == 'numeric':
+            return pa.array(parse_money(values), from_pandas=True)
+        array = pa.array(values, from_pandas=True)
+        if column_type == 'category':
+            return array.cast(pa.string()).dictionary_encode()
+        return array.cast(_arrow_type(column_type))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError):
+        return None
+
+
+def to_typed_frame(columns, column_types, length=None):
+    """
+    DataFrame a partir de {coluna: valores}, com as colunas de `column_types`
+    em tipos Arrow; as demais (e as que não convertem) ficam como object
+    """
+    index = pd.RangeIndex(length if length is not None else len(next(iter(columns.values()), [])))
+    if pa is None:
+        return pd.DataFrame(columns, index=index)
+
+    typed = {}
+    for column, values in columns.items():
+        column_type = column_types.get(column)
+        array = to_arrow_array(values, column_type) if _arrow_type(column_type) else None
+        if array is None:
+            typed[column] = pd.Series(values, index=index)
+        else:
+            typed[column] = pd.Series(pd.arrays.ArrowExtensionArray(array), index=index)
+    return pd.DataFrame(typed, index=index)
@@ -0,0 +1,118 @@
+"""
+Extração compilada de colunas a partir de caminhos ("customer.id", "shipping_address.zip").
+
+Substitui `pd.json_normalize(registros)` seguido do filtro de colunas: em vez de
+criar uma coluna para cada chave aninhada de cada registro e descartar a maioria,
+monta só as colunas pedidas, numa passada pelos registros.
+
+Mantém a semântica do `json_normalize(sep='.')` para os caminhos pedidos:
+- dicts são achatados, então um caminho que termina num dict não vira coluna
+  (ex.: "client_details" quando é um objeto); listas e escalares viram valores
+- uma coluna só existe se algum registro tiver o caminho; registros sem ele
+  ficam com NaN
+"""
+import numpy as np
+import pandas as pd
+
+_MISSING = object()
+
+
+def _compile_path(path):
+    """
+    Função registro → valor (ou _MISSING) para um caminho com pontos
+    """
+    keys = tuple(path.split('.'))
+
+    def get(record):
+        value = record
+        for key in keys:
+            if not isinstance(value, dict):
+                return _MISSING
+            value = value.get(key, _MISSING)
+            if value is _MISSING:
+                return _MISSING
+        return _MISSING if isinstance(value, dict) else value
+    return get
+
+
+class FieldExtractor:
+    """
+    Uso:
+
+        extractor = FieldExtractor(['id', 'customer.id', 'shipping_address.zip'])
+        df = extractor.to_frame(orders)
+
+    Para combinar com outros cálculos na mesma passada pelos registros:
+
+        buffers = extractor.new_buffers(len(orders))
+        for index, order in enumerate(orders):
+            extractor.fill(buffers, index, order)
+            ...
+        df = pd.DataFrame(extractor.finish(buffers))
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+
+        # Caminhos agrupados por profundidade: chaves de topo são lidas direto,
+        # "pai.filho" lê o objeto pai uma vez só para todos os filhos
+        self._top = []
+        self._nested = {}
+        self._deep = []
+        for position, path in enumerate(self.paths):
+            keys = path.split('.')
+            if len(keys) == 1:
+                self._top.append((keys[0], position))
+            elif len(keys) == 2:
+                self._nested.setdefault(keys[0], []).append((keys[1], position))
+            else:
+                self._deep.append((_compile_path(path), position))
+        self._nested = list(self._nested.items())
+
+    def new_buffers(self, size):
+        """Uma lista pré-alocada de `size` posições por caminho"""
+        return [[_MISSING] * size for _ in self.paths]
+
+    def fill(self, buffers, index, record):
+        """Preenche a posição `index` dos buffers com os valores de `record`"""
+        for key, position in self._top:
+            value = record.get(key, _MISSING)
+            if not isinstance(value, dict):
+                buffers[position][index] = value
+
+        for parent, children in self._nested:
+            nested = record.get(parent)
+            if isinstance(nested, dict):
+                for child, position in children:
+                    value = nested.get(child, _MISSING)
+                    if not isinstance(value, dict):
+                        buffers[position][index] = value
+
+        for get, position in self._deep:
+            buffers[position][index] = get(record)
+
+    def finish(self, buffers):
+        """
+        {caminho: lista de valores} só com os caminhos presentes em algum registro
+        """
+        result = {}
+        for path, column in zip(self.paths, buffers):
+            missing = column.count(_MISSING)
+            if missing == len(column):
+                continue
+            if missing:
+                column = [np.nan if value is _MISSING else value for value in column]
+            result[path] = column
+        return result
+
+    def extract(self, records):
+        records = records if isinstance(records, list) else list(records)
+        buffers = self.new_buffers(len(records))
+        fill = self.fill
+        for index, record in enumerate(records):
+            fill(buffers, index, record)
+        return self.finish(buffers)
+
+    def to_frame(self, records):
+        records = records if isinstance(records, list) else list(records)
+        return pd.DataFrame(self.extract(records), index=pd.RangeIndex(len(records)))
@@ -0,0 +1,260 @@
+"""
+Cliente da API pública do Movidesk (tickets).
+
+- Tickets completos em lotes pelo endpoint paginado, com `$select`/`$expand`
+  dos campos usados, em vez de listar IDs e buscar ticket a ticket; os lotes
+  (`$skip`) são buscados em paralelo
+- Busca por ID (`?id=`) só como fallback, concorrente e limitada pelo token
+  bucket (`utils.rate_limiter`): tickets cujo lote falhou ou cujas ações vieram
+  incompletas na listagem
+- Retentativas com backoff e jitter para 429, 5xx e erros de rede
+- Paginação por `$skip` em ordem de `id` crescente: tickets alterados durante a
+  execução continuam na mesma posição (o filtro é `lastUpdate gt ...`, que um
+  update não desfaz) e tickets novos entram no fim, então nenhum lote pula
+  registros
+"""
+import asyncio
+import os
+
+import aiohttp
+from mage_ai.data_preparation.shared.secrets import get_secret_value
+
+from utils.cartpanda_client import backoff_delay
+from utils.cartpanda_fetcher import run_sync
+from utils.rate_limiter import get_rate_limiter
+
+MOVIDESK_BASE_URL = os.getenv('MOVIDESK_BASE_URL', 'https://api.movidesk.com/public/v1')
+
+PAGE_SIZE = 500
+DEFAULT_CONCURRENCY = 5
+REQUEST_TIMEOUT = 60
+MAX_RETRIES = 5
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Campos do ticket retornados na listagem
+TICKET_SELECT = [
+    'id', 'protocol', 'type', 'subject', 'category', 'urgency', 'status', 'baseStatus',
+    'justification', 'origin', 'createdDate', 'isDeleted', 'originEmailAccount',
+    'ownerTeam', 'serviceFirstLevelId', 'serviceFirstLevel', 'serviceSecondLevel',
+    'serviceThirdLevel', 'contactForm', 'tags', 'cc', 'resolvedIn', 'reopenedIn',
+    'closedIn', 'lastActionDate', 'actionCount', 'lastUpdate', 'lifetimeWorkingTime',
+    'stoppedTime', 'stoppedTimeWorkingTime', 'resolvedInFirstCall', 'chatWidget',
+    'chatGroup', 'chatTalkTime', 'chatWaitingTime', 'sequence', 'slaAgreement',
+    'slaAgreementRule', 'slaSolutionTime', 'slaResponseTime', 'slaSolutionChangedByUser',
+    'slaSolutionChangedBy', 'slaSolutionDate', 'slaSolutionDateIsPaused',
+    'slaResponseDate', 'slaRealResponseDate', 'jiraIssueKey', 'redmineIssueId',
+    'movideskTicketNumber', 'linkedTicketReference',
+]
+
+# Relacionamentos expandidos na listagem
+TICKET_EXPAND = [
+    'owner', 'createdBy', 'clients($expand=organization)', 'actions',
+    'customFieldValues($expand=items)',
+]
+
+
+class MovideskHTTPError(Exception):
+    """Requisição que falhou mesmo após todas as retentativas"""
+
+    def __init__(self, status, message):
+        super().__init__(f"Movidesk HTTP {status} - {message}")
+        self.status = status
+
+
+def needs_detail(ticket):
+    """
+    A listagem pode trazer menos ações do que o ticket tem (`actionCount`);
+    esses tickets são completados pela busca por ID
+    """
+    actions = ticket.get('actions')
+    action_count = ticket.get('actionCount') or 0
+    return actions is None or len(actions) < action_count
+
+
+class MovideskClient:
+    """
+    Uso:
+
+        async with MovideskClient(rate=2.0) as client:
+            tickets = await client.get_tickets({'$top': 500, '$skip': 0, ...})
+    """
+
+    def __init__(self, token=None, rate=None, base_url=None, max_retries=MAX_RETRIES):
+        self.token = token or get_secret_value('MOVIDESK_TOKEN')
+        self.rate_limiter = get_rate_limiter(self.token, rate=rate)
+        self.base_url = base_url or MOVIDESK_BASE_URL
+        self.max_retries = max_retries
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=DEFAULT_CONCURRENCY * 2),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    async def get_tickets(self, params):
+        """
+        GET /tickets com retentativas. Retorna sempre uma lista de tickets.
+        """
+        query = {'token': self.token, **params}
+        url = f'{self.base_url}/tickets'
+
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire_async()
+            try:
+                async with self._session.get(url, params=query) as response:
+                    if response.status < 400:
+                        data = await response.json(content_type=None)
+                        if isinstance(data, dict):
+                            return [data]
+                        return data or []
+                    status = response.status
+                    message = response.reason
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError) as e:
+                status, message, retry_after = None, repr(e), None
+
+            if status is not None and status not in RETRYABLE_STATUS:
+                raise MovideskHTTPError(status, message)
+            if attempt == self.max_retries:
+                break
+
+            if status == 429:
+                delay = self.rate_limiter.penalize(retry_after)
+            else:
+                delay = backoff_delay(attempt)
+                await asyncio.sleep(delay)
+            print(f"⏳ Movidesk: {status or message}, tentativa {attempt + 1}/{self.max_retries} em {delay:.1f}s")
+
+        raise MovideskHTTPError(status, message)
+
+    async def get_ticket(self, ticket_id):
+        tickets = await self.get_tickets({'id': ticket_id})
+        return tickets[0] if tickets else None
+
+
+def build_list_params(filter_expr=None, skip=0, top=PAGE_SIZE, select=None, expand=None,
+                      orderby='id asc'):
+    params = {
+        '$select': ','.join(select or TICKET_SELECT),
+        '$expand': ','.join(expand or TICKET_EXPAND),
+        '$orderby': orderby,
+        '$top': top,
+        '$skip': skip,
+    }
+    if filter_expr:
+        params['$filter'] = filter_expr
+    return params
+
+
+async def fetch_ticket_details_async(client, ticket_ids, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Busca tickets por ID em paralelo (limitado por `concurrency` e pelo rate limiter).
+    Retorna (tickets, {id: Exception}).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(ticket_ids)
+
+    async def fetch_one(index, ticket_id):
+        async with semaphore:
+            ticket = await client.get_ticket(ticket_id)
+        print(f"[{index}/{total}] ✅ Ticket {ticket_id} carregado por ID")
+        return ticket
+
+    results = await asyncio.gather(
+        *(fetch_one(index, ticket_id) for index, ticket_id in enumerate(ticket_ids, 1)),
+        return_exceptions=True,
+    )
+
+    tickets, errors = [], {}
+    for ticket_id, result in zip(ticket_ids, results):
+        if isinstance(result, Exception):
+            print(f"❌ Erro ao buscar ticket {ticket_id}: {result}")
+            errors[ticket_id] = result
+        elif result:
+            tickets.append(result)
+    return tickets, errors
+
+
+async def fetch_page_ids(client, filter_expr, skip, top=PAGE_SIZE):
+    """IDs de uma página (consulta leve, usada quando o lote completo falha)"""
+    params = {'$select': 'id', '$orderby': 'id asc', '$top': top, '$skip': skip}
+    if filter_expr:
+        params['$filter'] = filter_expr
+    return [ticket['id'] for ticket in await client.get_tickets(params) if 'id' in ticket]
+
+
+async def fetch_tickets_async(filter_expr=None, rate=None, concurrency=DEFAULT_CONCURRENCY,
+                              page_size=PAGE_SIZE, token=None):
+    """
+    Busca todos os tickets do filtro em lotes de `page_size` com `$select`/`$expand`.
+    Os `$skip` são buscados em paralelo, `concurrency` lotes por rodada, até um
+    lote vir incompleto. Tickets de lotes que falharam ou com ações incompletas
+    são buscados por ID.
+
+    Retorna (tickets, {id: Exception}) com os tickets que não puderam ser
+    buscados por ID: quem chama não deve avançar o high-water mark se houver
+    algum erro.
+    """
+    tickets = {}
+    detail_ids = []
+
+    async with MovideskClient(token=token, rate=rate) as client:
+
+        async def fetch_batch(skip):
+            try:
+                page = await client.get_tickets(build_list_params(filter_expr, skip, page_size))
+            except MovideskHTTPError as e:
+                print(f"⚠️ Lote skip={skip} falhou ({e}); buscando os tickets por ID")
+                page_ids = await fetch_page_ids(client, filter_expr, skip, page_size)
+                detail_ids.extend(page_ids)
+                return len(page_ids)
+
+            for ticket in page:
+                if needs_detail(ticket):
+                    detail_ids.append(ticket['id'])
+                tickets[ticket['id']] = ticket
+            print(f"→ Movidesk | skip={skip}: {len(page)} tickets")
+            return len(page)
+
+        skip = 0
+        while True:
+            skips = [skip + n * page_size for n in range(concurrency)]
+            sizes = await asyncio.gather(*(fetch_batch(batch_skip) for batch_skip in skips))
+            if any(size < page_size for size in sizes):
+                break
+            skip += concurrency * page_size
+
+        if detail_ids:
+            print(f"🔎 {len(detail_ids)} tickets precisam de busca por ID")
+            detailed, errors = await fetch_ticket_details_async(client, detail_ids, concurrency)
+            for ticket in detailed:
+                tickets[ticket['id']] = ticket
+        else:
+            errors = {}
+
+    return list(tickets.values()), errors
+
+
+def fetch_tickets(*args, **kwargs):
+    """
+    Versão síncrona de `fetch_tickets_async`
+    """
+    return run_sync(fetch_tickets_async(*args, **kwargs))
+
+
+def fetch_ticket_details(ticket_ids, rate=None, concurrency=DEFAULT_CONCURRENCY, token=None):
+    """
+    Versão síncrona da busca por ID (para listas de IDs vindas de outro bloco)
+    """
+    async def run():
+        async with MovideskClient(token=token, rate=rate) as client:
+            tickets, _ = await fetch_ticket_details_async(client, ticket_ids, concurrency)
+            return tickets
+
+    return run_sync(run())
@@ -0,0 +1,159 @@
+"""
+Cache em disco das páginas brutas da API CartPanda (NDJSON comprimido com gzip).
+
+Cada página vira um arquivo `<dir>/<slug>/<endpoint>/<hash>.ndjson.gz`, onde o
+hash identifica (slug, endpoint, parâmetros, página). A primeira linha guarda o
+envelope (`meta`) e as demais um registro por linha. Permite reexecutar
+transformers/exporters com dados reais sem chamar a API.
+
+Entradas expiram após `ttl_seconds` e, quando o cache passa de `max_bytes`, os
+arquivos mais antigos são removidos.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+PAGE_CACHE_DIR = os.getenv(
+    'CARTPANDA_PAGE_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.mage_data', 'cartpanda_page_cache'),
+)
+DEFAULT_TTL_HOURS = 24
+DEFAULT_MAX_MB = 1024
+
+CACHE_SUFFIX = '.ndjson.gz'
+
+
+def _dump_record(record):
+    # Pedidos da decodificação tipada guardam o JSON original em `raw`
+    raw = getattr(record, 'raw', None)
+    if raw is not None:
+        return bytes(raw).decode('utf-8')
+    return json.dumps(record, ensure_ascii=False)
+
+
+class PageCache:
+
+    def __init__(self, directory=PAGE_CACHE_DIR, ttl_seconds=DEFAULT_TTL_HOURS * 3600,
+                 max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, slug, endpoint, params, page):
+        key = json.dumps(
+            {'slug': slug, 'endpoint': endpoint, 'params': params or {}, 'page': page},
+            sort_keys=True, default=str,
+        )
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, slug, endpoint, f'{digest}{CACHE_SUFFIX}')
+
+    def get(self, slug, endpoint, params, page):
+        """
+        Retorna a página no mesmo formato da API ({endpoint: [...], 'meta': {...}})
+        ou None se não estiver em cache ou tiver expirado
+        """
+        path = self._path(slug, endpoint, params, page)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                with self._lock:
+                    self.misses += 1
+                return None
+
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                envelope = json.loads(f.readline())
+                records = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        envelope[endpoint] = records
+        return envelope
+
+    def put(self, slug, endpoint, params, page, data):
+        path = self._path(slug, endpoint, params, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        envelope = {key: value for key, value in data.items() if key != endpoint}
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(envelope, ensure_ascii=False))
+            f.write('\n')
+            for record in data.get(endpoint, []):
+                f.write(_dump_record(record))
+                f.write('\n')
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _cache_files(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(CACHE_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def _scan_size(self):
+        return sum(size for _, _, size in self._cache_files())
+
+    def _evict(self):
+        """
+        Remove arquivos expirados e, se ainda necessário, os mais antigos até
+        o cache ficar abaixo de 90% do limite
+        """
+        now = time.time()
+        files = sorted(self._cache_files(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in files)
+        target = self.max_bytes * 0.9
+        removed = 0
+
+        for path, mtime, size in files:
+            if total <= target and now - mtime <= self.ttl_seconds:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        self._size = total
+        if removed:
+            print(f"🧹 Cache de páginas: {removed} arquivos removidos ({total / 1024 / 1024:.1f} MB em uso)")
+
+
+def page_cache_from_kwargs(kwargs):
+    """
+    Cria o cache a partir das variáveis do bloco (desligado por padrão):
+    `page_cache`, `page_cache_ttl_hours`, `page_cache_max_mb`, `page_cache_dir`
+    """
+    if not kwargs.get('page_cache'):
+        return None
+
+    cache = PageCache(
+        directory=kwargs.get('page_cache_dir', PAGE_CACHE_DIR),
+        ttl_seconds=float(kwargs.get('page_cache_ttl_hours', DEFAULT_TTL_HOURS)) * 3600,
+        max_bytes=int(float(kwargs.get('page_cache_max_mb', DEFAULT_MAX_MB)) * 1024 * 1024),
+    )
+    print(f"💾 Cache de páginas ativo em {cache.directory}")
+    return cache
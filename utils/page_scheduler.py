@@ -0,0 +1,189 @@
+"""
+Escalonador de páginas da API CartPanda com pool global de workers.
+
+Em vez de uma tarefa (ou thread) por loja, `workers` corrotinas compartilham
+uma fila de páginas de todas as lojas:
+
+- Descoberta primeiro: a primeira página de cada loja (que informa o
+  `last_page`) tem prioridade, então todas as lojas entram no pool logo no início
+- Divisão justa: cada worker livre pega a próxima página da loja com menos
+  requisições em andamento e, no empate, da loja com maior backlog (páginas
+  restantes), então lojas pequenas não ficam esperando atrás das grandes
+- Roubo de trabalho: workers não são presos a uma loja; quando as lojas
+  pequenas terminam, os workers ociosos passam a buscar páginas das grandes
+
+As páginas de cada loja são entregues a `on_page` em ordem (páginas adiantadas
+esperam em memória, no máximo `max_ahead` por loja), o que mantém os
+checkpoints do modo streaming exatos. Incluir lojas aumenta a vazão total, não
+a quantidade de tarefas simultâneas.
+"""
+import asyncio
+
+RECORD_LABELS = {
+    'orders': 'pedidos',
+    'customers': 'clientes',
+}
+
+
+class _ShopState:
+
+    def __init__(self, slug, params, start_page):
+        self.slug = slug
+        self.params = params
+        self.first_page = start_page
+        self.next_page = start_page
+        self.next_to_deliver = start_page
+        self.last_page = None
+        self.in_flight = 0
+        self.completed = {}
+        self.error = None
+        self.ended = False
+        self.lock = asyncio.Lock()
+
+    @property
+    def backlog(self):
+        if self.error is not None:
+            return 0
+        if self.last_page is None:
+            # Primeira página ainda não buscada: prioridade máxima (descoberta)
+            return float('inf') if self.next_page == self.first_page else 0
+        return max(self.last_page - self.next_page + 1, 0)
+
+    @property
+    def finished(self):
+        if self.error is not None:
+            return self.in_flight == 0
+        return self.last_page is not None and self.next_to_deliver > self.last_page
+
+
+class PageScheduler:
+    """
+    Uso:
+
+        scheduler = PageScheduler(client, 'orders', slugs, on_page, workers=10)
+        errors = await scheduler.run()
+
+    `on_page(slug, página, registros)` e `on_end(slug, erro)` podem ser funções
+    comuns ou corrotinas; `on_end` é chamado uma vez por loja, com `None` se a
+    loja terminou sem erro.
+    """
+
+    def __init__(self, client, endpoint, slugs, on_page, on_end=None, workers=10,
+                 params=None, params_by_slug=None, start_pages=None,
+                 per_shop_limit=None, max_ahead=None):
+        params_by_slug = params_by_slug or {}
+        start_pages = start_pages or {}
+        self.client = client
+        self.endpoint = endpoint
+        self.label = RECORD_LABELS.get(endpoint, endpoint)
+        self.on_page = on_page
+        self.on_end = on_end
+        self.workers = max(int(workers), 1)
+        self.per_shop_limit = per_shop_limit
+        self.max_ahead = max_ahead or self.workers
+        self.shops = [
+            _ShopState(slug, params_by_slug.get(slug, params), start_pages.get(slug, 1))
+            for slug in slugs
+        ]
+        self._condition = None
+
+    def _eligible(self, shop):
+        if shop.ended or shop.backlog == 0:
+            return False
+        if self.per_shop_limit and shop.in_flight >= self.per_shop_limit:
+            return False
+        # Limita páginas em memória aguardando entrega em ordem
+        return shop.in_flight + len(shop.completed) < self.max_ahead
+
+    def _pick(self):
+        candidates = [shop for shop in self.shops if self._eligible(shop)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda shop: (-shop.in_flight, shop.backlog))
+
+    def _all_ended(self):
+        return all(shop.ended for shop in self.shops)
+
+    async def _call(self, callback, *args):
+        result = callback(*args)
+        if asyncio.iscoroutine(result):
+            await result
+
+    async def _deliver(self, shop):
+        # Um worker por vez entrega as páginas consecutivas já recebidas da loja
+        async with shop.lock:
+            while shop.next_to_deliver in shop.completed:
+                page = shop.next_to_deliver
+                records = shop.completed.pop(page)
+                await self._call(self.on_page, shop.slug, page, records)
+                shop.next_to_deliver += 1
+
+            if shop.finished and not shop.ended:
+                shop.ended = True
+                shop.completed.clear()
+                if self.on_end is not None:
+                    await self._call(self.on_end, shop.slug, shop.error)
+
+    def _page_records(self, shop, data):
+        records = data.get(self.endpoint, [])
+        # Adiciona o shop_slug a cada registro (dict ou `Order` da decodificação tipada)
+        for record in records:
+            if isinstance(record, dict):
+                record['shop_slug'] = shop.slug
+            else:
+                record.shop_slug = shop.slug
+        return records
+
+    async def _fetch(self, shop, page):
+        try:
+            data = await self.client.get_page(shop.slug, self.endpoint, shop.params, page)
+        except Exception as e:
+            if shop.error is None:
+                print(f"❌ Erro ao coletar {self.endpoint} da loja {shop.slug} (página {page}): {e}")
+                shop.error = e
+            return
+
+        if shop.last_page is None:
+            shop.last_page = data.get('meta', {}).get('last_page', 1) or 1
+        records = self._page_records(shop, data)
+        print(f"→ {shop.slug} | Página {page}/{shop.last_page}: {len(records)} {self.label}")
+        shop.completed[page] = records
+
+    async def _worker(self):
+        condition = self._condition
+        while True:
+            async with condition:
+                while True:
+                    if self._all_ended():
+                        return
+                    shop = self._pick()
+                    if shop is not None:
+                        break
+                    await condition.wait()
+                page = shop.next_page
+                shop.next_page += 1
+                shop.in_flight += 1
+
+            try:
+                await self._fetch(shop, page)
+            finally:
+                shop.in_flight -= 1
+
+            await self._deliver(shop)
+            async with condition:
+                condition.notify_all()
+
+    async def run(self):
+        """
+        Busca todas as páginas de todas as lojas. Retorna {slug: Exception} das
+        lojas que falharam (as demais não são interrompidas).
+        """
+        self._condition = asyncio.Condition()
+        tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return {shop.slug: shop.error for shop in self.shops if shop.error is not None}
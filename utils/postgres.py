@@ -0,0 +1,532 @@
+"""
+Utilitários de exportação para PostgreSQL compartilhados pelos data exporters.
+"""
+import io
+import json
+
+import pandas as pd
+from mage_ai.data_preparation.shared.secrets import get_secret_value
+from pandas.api import types as pd_types
+from sqlalchemy import create_engine, text
+from sqlalchemy import types as sa_types
+
+from utils.schema_registry import schema_registry
+
+try:
+    import msgspec
+except ImportError:  # dependência opcional
+    msgspec = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # dependência opcional
+    pa = pa_csv = None
+
+# Valores não nulos inspecionados (no início e no fim) para detectar colunas aninhadas
+NESTED_SAMPLE_SIZE = 500
+
+# Linhas por bloco CSV enviado no COPY da tabela temporária
+COPY_CHUNK_ROWS = 100_000
+STAGING_METHODS = ('copy', 'insert')
+
+# Tabelas temporárias de sessão (uma por conexão: execuções concorrentes não colidem)
+STAGING_SCHEMA = 'pg_temp'
+
+# Tipos de `postgres_type` como aparecem em information_schema.columns.data_type
+_INFORMATION_SCHEMA_TYPES = {
+    'BOOLEAN': 'boolean',
+    'BIGINT': 'bigint',
+    'DOUBLE PRECISION': 'double precision',
+    'TIMESTAMPTZ': 'timestamp with time zone',
+    'TIMESTAMP': 'timestamp without time zone',
+    'TEXT': 'text',
+}
+
+
+def create_railway_engine():
+    """
+    Engine do DATA LAKE RAILWAY
+    """
+    POSTGRES_HOST = get_secret_value('POSTGRES_HOST_RAILWAY')
+    POSTGRES_PORT = get_secret_value('POSTGRES_PORT_RAILWAY')
+    POSTGRES_DB   = get_secret_value('POSTGRES_DB_RAILWAY')
+    POSTGRES_USER = get_secret_value('POSTGRES_USER_RAILWAY')
+    POSTGRES_PASS = get_secret_value('POSTGRES_PASS_RAILWAY')
+
+    datalake_railway_conn_string = (
+        f'postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASS}'
+        f'@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
+    )
+    return create_engine(datalake_railway_conn_string)
+
+
+def create_replication_engine():
+    """
+    Engine do banco de REPLICAÇÃO/DEV (VPS Hostinger)
+    """
+    POSTGRES_HOST = get_secret_value('POSTGRES_HOST')
+    POSTGRES_PORT = get_secret_value('DB_PORT')
+    POSTGRES_DB   = get_secret_value('DB_NAME')
+    POSTGRES_USER = get_secret_value('DB_USER')
+    POSTGRES_PASS = get_secret_value('DB_PASSWORD')
+
+    connection_string = (
+        f'postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASS}'
+        f'@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
+    )
+    return create_engine(connection_string)
+
+
+def ensure_schema(engine, schema):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+
+
+def add_missing_columns(engine, df, table_name, schema, column_types=None):
+    """
+    Tabelas criadas pela versão antiga (to_sql replace) não têm colunas novas;
+    adiciona com o tipo declarado em `column_types` (ou TEXT) para o upsert não falhar
+    """
+    column_types = column_types or {}
+    registry = schema_registry(engine)
+    with engine.begin() as conn:
+        layout = registry.table(conn, schema, table_name, df.columns)
+        if layout is None:
+            return
+        missing_columns = [col for col in df.columns if col not in layout.columns]
+        for col in missing_columns:
+            column_type = column_types.get(col, 'TEXT')
+            conn.execute(text(f'ALTER TABLE {schema}.{table_name} ADD COLUMN IF NOT EXISTS "{col}" {column_type}'))
+    if missing_columns:
+        registry.invalidate(schema)
+
+
+def migrate_column_types(engine, table_name, schema, column_types):
+    """
+    Converte colunas TEXT de tabelas criadas antes do schema declarado para os
+    tipos de `column_types`. Cada coluna é convertida na sua própria transação:
+    se algum valor não converte, a coluna continua TEXT e as demais seguem.
+    """
+    registry = schema_registry(engine)
+    with engine.connect() as conn:
+        # Sempre relido: a tabela pode ter sido recriada por um to_sql replace
+        layout = registry.refresh(conn, schema).get(table_name)
+    current_types = layout.columns if layout is not None else {}
+
+    for col, column_type in column_types.items():
+        if current_types.get(col) != 'text' or column_type == 'TEXT':
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"""
+                    ALTER TABLE {schema}.{table_name}
+                    ALTER COLUMN "{col}" TYPE {column_type} USING NULLIF("{col}", '')::{column_type}
+                """))
+            registry.invalidate(schema)
+            print(f"🔧 {table_name}.{col}: TEXT → {column_type}")
+        except Exception as e:
+            registry.failed_migrations.add((schema, table_name, col))
+            print(f"⚠️ {table_name}.{col} continua TEXT: {str(e).splitlines()[0]}")
+
+
+def migrate_text_columns(engine, df, table_name, schema, column_types):
+    """
+    Colunas de `df` que na tabela ainda são TEXT (criadas antes do schema
+    declarado) mas têm outro tipo em `column_types` são convertidas antes do
+    upsert, para não gravar valores tipados ao lado do formato antigo. Com o
+    layout em cache, não faz consultas quando não há nada a converter; uma
+    coluna que não converte não é tentada de novo no mesmo processo.
+    """
+    registry = schema_registry(engine)
+    with engine.connect() as conn:
+        layout = registry.table(conn, schema, table_name)
+    if layout is None:
+        return
+
+    pending = {
+        col: column_types[col] for col in df.columns
+        if column_types.get(col, 'TEXT') != 'TEXT'
+        and layout.columns.get(col) == 'text'
+        and (schema, table_name, col) not in registry.failed_migrations
+    }
+    if pending:
+        migrate_column_types(engine, table_name, schema, pending)
+
+
+def drop_unchanged_rows(conn, df, table_name, schema, primary_key, hash_column):
+    """
+    Remove do DataFrame as linhas cujo hash de conteúdo é igual ao já gravado
+    na tabela (uma consulta com todos os ids candidatos)
+    """
+    layout = schema_registry(conn.engine).table(conn, schema, table_name, [primary_key, hash_column])
+    if layout is None or primary_key not in layout.columns or hash_column not in layout.columns:
+        return df
+    target_types = layout.columns
+
+    ids = df[primary_key].tolist()
+    rows = conn.execute(text(f"""
+        SELECT "{primary_key}", "{hash_column}" FROM {schema}.{table_name}
+        WHERE "{primary_key}" = ANY(CAST(:ids AS {target_types[primary_key]}[]))
+    """), {'ids': ids}).fetchall()
+    stored = {str(key): str(value) for key, value in rows}
+
+    changed = [stored.get(str(key)) != str(value) for key, value in zip(ids, df[hash_column].tolist())]
+    return df[changed]
+
+
+def _cast_expression(col, source_type, target_type):
+    """
+    Coluna da tabela temporária convertida para o tipo da tabela de destino
+    (ex.: JSON serializado → JSONB, preço em texto → NUMERIC)
+    """
+    if target_type in (None, source_type, 'text', 'character varying', 'ARRAY', 'USER-DEFINED'):
+        return f'"{col}"'
+    if source_type != 'text':
+        return f'"{col}"::{target_type}'
+    return f"""NULLIF("{col}", '')::{target_type}"""
+
+
+def postgres_type(dtype):
+    """
+    Tipo PostgreSQL de uma coluna (dtypes numpy ou Arrow)
+    """
+    if pd_types.is_bool_dtype(dtype):
+        return 'BOOLEAN'
+    if pd_types.is_integer_dtype(dtype):
+        return 'BIGINT'
+    if pd_types.is_float_dtype(dtype):
+        return 'DOUBLE PRECISION'
+    if pd_types.is_datetime64_any_dtype(dtype):
+        tz = getattr(dtype, 'tz', None) or getattr(getattr(dtype, 'pyarrow_dtype', None), 'tz', None)
+        return 'TIMESTAMPTZ' if tz else 'TIMESTAMP'
+    return 'TEXT'
+
+
+def _json_encoder():
+    """
+    Serializa uma lista de valores em JSON compacto de uma vez (msgspec, se
+    instalado; senão json.dumps valor a valor)
+    """
+    if msgspec is not None:
+        encoder = msgspec.json.Encoder(enc_hook=str)
+
+        def encode_all(values):
+            # JSON compacto não tem quebras de linha: uma linha por valor
+            return encoder.encode_lines(values).decode('utf-8').split('\n')[:-1]
+        return encode_all
+
+    def encode_all(values):
+        return [json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str)
+                for value in values]
+    return encode_all
+
+
+_encode_json = _json_encoder()
+
+
+def nested_columns(df, column_types=None, sample_size=NESTED_SAMPLE_SIZE):
+    """
+    Colunas com dicts/listas: as declaradas como JSONB em `column_types` e,
+    entre as não declaradas de tipo object, as que têm dict ou lista numa
+    amostra (primeiros e últimos `sample_size` valores não nulos)
+    """
+    column_types = column_types or {}
+    nested = []
+    for col in df.columns:
+        declared = column_types.get(col)
+        if declared is not None:
+            if declared == 'JSONB':
+                nested.append(col)
+            continue
+        if df[col].dtype != object:
+            continue
+        values = df[col][df[col].notna()]
+        sample = pd.concat([values.head(sample_size), values.tail(sample_size)])
+        if any(isinstance(value, (dict, list)) for value in sample):
+            nested.append(col)
+    return nested
+
+
+def json_column_types(df, column_types=None):
+    """
+    `column_types` acrescido de JSONB para as colunas aninhadas detectadas na
+    amostra (para tabelas sem schema declarado)
+    """
+    column_types = dict(column_types or {})
+    for col in nested_columns(df, column_types):
+        column_types[col] = 'JSONB'
+    return column_types
+
+
+class _SerializedJSONB(sa_types.UserDefinedType):
+    """
+    Coluna JSONB que recebe o JSON já serializado por `sanitize_for_postgres`
+    (o texto é convertido pelo PostgreSQL no INSERT, sem serializar de novo)
+    """
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return 'JSONB'
+
+
+_SQLALCHEMY_TYPES = {
+    'BIGINT': sa_types.BigInteger,
+    'NUMERIC': sa_types.Numeric,
+    'DOUBLE PRECISION': sa_types.Float,
+    'BOOLEAN': sa_types.Boolean,
+    'TIMESTAMPTZ': lambda: sa_types.TIMESTAMP(timezone=True),
+    'TIMESTAMP': sa_types.TIMESTAMP,
+    'TEXT': sa_types.Text,
+    'JSONB': _SerializedJSONB,
+}
+
+
+def to_sql_dtypes(df, column_types):
+    """
+    `dtype=` do `DataFrame.to_sql` com os tipos declarados ({coluna: tipo
+    PostgreSQL}) das colunas de `df`: a tabela já é criada com eles
+    """
+    return {col: _SQLALCHEMY_TYPES[column_types[col]]() for col in df.columns if col in column_types}
+
+
+def sanitize_for_postgres(df, column_types=None):
+    """
+    Serializa as colunas aninhadas (ver `nested_columns`) em JSON compacto, de
+    uma vez por coluna. Valores nulos continuam nulos. Colunas tipadas e de
+    texto não são percorridas.
+    """
+    if df.empty:
+        return df  # Retorna DataFrame vazio sem modificações
+
+    for col in nested_columns(df, column_types):
+        column = df[col]
+        present = column.notna().to_numpy()
+        encoded = column.astype(object)
+        encoded[present] = _encode_json(column[present].tolist())
+        df[col] = encoded.where(present, None)
+    return df
+
+
+def _arrow_table(df):
+    """
+    Tabela Arrow do DataFrame; colunas object com tipos misturados vão como texto
+    """
+    arrays = {}
+    for col in df.columns:
+        series = df[col]
+        try:
+            arrays[str(col)] = pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            arrays[str(col)] = pa.array(series.astype(str).where(series.notna(), None), type=pa.string())
+    return pa.table(arrays)
+
+
+def _csv_chunks(df, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Blocos CSV (bytes) de `chunk_rows` linhas no formato do COPY: com pyarrow
+    o CSV é escrito direto das colunas; nulos saem vazios e textos entre aspas
+    (texto vazio sai como ""). Sem pyarrow, usa `DataFrame.to_csv` com nulo \\N.
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        buffer = io.BytesIO()
+        if pa is not None:
+            pa_csv.write_csv(_arrow_table(chunk), buffer, pa_csv.WriteOptions(include_header=False))
+        else:
+            chunk.to_csv(buffer, header=False, index=False, na_rep='\\N', encoding='utf-8')
+        buffer.seek(0)
+        yield buffer
+
+
+def copy_dataframe(conn, df, table_name, schema, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Carrega `df` numa tabela existente com COPY FROM STDIN (CSV), na transação
+    de `conn`. Retorna False se o driver não suporta COPY (não é psycopg2).
+    """
+    cursor = conn.connection.cursor()
+    if not hasattr(cursor, 'copy_expert'):
+        return False
+
+    columns_str = ', '.join([f'"{col}"' for col in df.columns])
+    null_option = '' if pa is not None else ", NULL '\\N'"
+    statement = f"COPY {schema}.{table_name} ({columns_str}) FROM STDIN WITH (FORMAT csv{null_option})"
+    try:
+        for buffer in _csv_chunks(df, chunk_rows):
+            cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+    return True
+
+
+def stage_dataframe(conn, df, table_name, method='copy'):
+    """
+    Cria a tabela temporária de sessão `pg_temp.table_name` (sem WAL, removida
+    no fim da transação de `conn`) com as colunas de `df` e a carrega.
+
+    'copy': carga via COPY (sem INSERT linha a linha); 'insert':
+    `DataFrame.to_sql`, um INSERT por lote.
+
+    Retorna {coluna: data_type} da tabela temporária (nomes do
+    information_schema, para comparar com a tabela de destino).
+    """
+    if method not in STAGING_METHODS:
+        raise ValueError(f"method deve ser um de {STAGING_METHODS}, recebido: {method!r}")
+
+    staging_types = {col: postgres_type(df[col].dtype) for col in df.columns}
+    column_definitions = ', '.join(f'"{col}" {column_type}' for col, column_type in staging_types.items())
+    conn.execute(text(f"CREATE TEMP TABLE {table_name} ({column_definitions}) ON COMMIT DROP"))
+
+    loaded = method == 'copy' and copy_dataframe(conn, df, table_name, STAGING_SCHEMA)
+    if method == 'copy' and not loaded:
+        print("⚠️ Driver sem suporte a COPY - usando INSERT")
+    if not loaded:
+        # Sem schema o nome resolve para a tabela temporária da sessão
+        df.to_sql(name=table_name, con=conn, if_exists='append', index=False)
+
+    return {col: _INFORMATION_SCHEMA_TYPES[column_type] for col, column_type in staging_types.items()}
+
+
+def upsert_dataframe(df, table_name, schema, engine, primary_key, column_types=None, hash_column=None,
+                     staging='copy'):
+    """
+    Função para fazer upsert (INSERT ... ON CONFLICT DO UPDATE) no PostgreSQL
+    Trata adequadamente DataFrames vazios
+
+    Com `column_types` ({coluna: tipo PostgreSQL}, ex.: ORDER_TABLE_TYPES) a
+    tabela é criada com os tipos declarados, colunas novas são adicionadas com
+    eles, colunas antigas ainda TEXT são convertidas antes (`migrate_text_columns`)
+    e os valores são convertidos para os tipos da tabela no INSERT.
+
+    Com `hash_column` (ex.: 'content_hash'), linhas com o mesmo hash já gravado
+    não são enviadas.
+
+    Os dados passam por uma tabela temporária de sessão (ON COMMIT DROP),
+    carregada via COPY (`staging='copy'`) ou com `to_sql` (`staging='insert'`);
+    ver `stage_dataframe`.
+    """
+    # Verifica se o DataFrame está vazio
+    if df.empty:
+        print(f"ℹ️  DataFrame vazio para {table_name} - pulando upsert")
+        return
+    
+    temp_table = f"{table_name}_stage"
+    
+    if column_types:
+        migrate_text_columns(engine, df, table_name, schema, column_types)
+
+    registry = schema_registry(engine)
+    try:
+        with engine.begin() as conn:
+            # 0. Descarta linhas inalteradas (mesmo hash de conteúdo já gravado)
+            if hash_column and hash_column in df.columns:
+                initial_count = len(df)
+                df = drop_unchanged_rows(conn, df, table_name, schema, primary_key, hash_column)
+                print(f"🔁 {table_name}: {initial_count - len(df)} de {initial_count} registros inalterados")
+                if df.empty:
+                    return
+
+            # 1. Criar tabela temporária com os novos dados
+            source_types = stage_dataframe(conn, df, temp_table, staging)
+        
+            # 2. Verificar se a tabela principal existe (layout em cache)
+            layout = registry.table(conn, schema, table_name, df.columns)
+        
+            if layout is None:
+                # 3a. Criar tabela principal pela primeira vez (com constraint)
+                columns = df.columns.tolist()
+            
+                # Definir tipos de colunas baseado no DataFrame
+                column_definitions = []
+                for col in columns:
+                    column_type = (column_types or {}).get(col) or postgres_type(df[col].dtype)
+                    if col == primary_key:
+                        if column_type not in ('BIGINT', 'TEXT'):
+                            column_type = 'TEXT'
+                        column_definitions.append(f'"{col}" {column_type} PRIMARY KEY')
+                    else:
+                        column_definitions.append(f'"{col}" {column_type}')
+            
+                create_table_sql = f"""
+                    CREATE TABLE {schema}.{table_name} (
+                        {', '.join(column_definitions)}
+                    )
+                """
+                conn.execute(text(create_table_sql))
+                registry.invalidate(schema)
+                print(f"📝 Tabela {table_name} criada com PRIMARY KEY em '{primary_key}'")
+            else:
+                # 3b. Verificar se existe uma constraint de unicidade na coluna desejada
+                if primary_key not in layout.unique_columns:
+                    registry.invalidate(schema)
+                    try:
+                        # Verificar se já existe uma PRIMARY KEY na tabela
+                        if layout.has_primary_key:
+                            # Já existe PK, criar UNIQUE constraint
+                            conn.execute(text(f"""
+                                ALTER TABLE {schema}.{table_name} 
+                                ADD CONSTRAINT uk_{table_name}_{primary_key} 
+                                UNIQUE ("{primary_key}")
+                            """))
+                            print(f"🔑 UNIQUE constraint adicionada na coluna '{primary_key}' (PRIMARY KEY já existe)")
+                        else:
+                            # Não existe PK, pode criar uma
+                            conn.execute(text(f"""
+                                ALTER TABLE {schema}.{table_name} 
+                                ADD PRIMARY KEY ("{primary_key}")
+                            """))
+                            print(f"🔑 PRIMARY KEY adicionada na coluna '{primary_key}'")
+                        
+                    except Exception as e:
+                        print(f"⚠️ Não foi possível adicionar constraint: {e}")
+                        # Como última alternativa, tentar UNIQUE com nome diferente
+                        try:
+                            conn.execute(text(f"""
+                                CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_{table_name}_{primary_key}
+                                ON {schema}.{table_name} ("{primary_key}")
+                            """))
+                            print(f"🔑 UNIQUE INDEX criado na coluna '{primary_key}'")
+                        except Exception as e2:
+                            print(f"❌ Erro ao criar qualquer constraint: {e2}")
+                            raise
+                else:
+                    print(f"✅ Constraint de unicidade já existe na coluna '{primary_key}'")
+
+                missing_columns = [col for col in df.columns if col not in layout.columns]
+                if column_types and missing_columns:
+                    for col in missing_columns:
+                        column_type = column_types.get(col, 'TEXT')
+                        conn.execute(text(f'ALTER TABLE {schema}.{table_name} ADD COLUMN IF NOT EXISTS "{col}" {column_type}'))
+                    registry.invalidate(schema)
+        
+            # 4. Preparar colunas para o upsert
+            columns = df.columns.tolist()
+            columns_str = ', '.join([f'"{col}"' for col in columns])
+        
+            # Colunas para UPDATE (excluindo a chave primária)
+            update_columns = [col for col in columns if col != primary_key]
+            update_str = ', '.join([f'"{col}" = EXCLUDED."{col}"' for col in update_columns])
+        
+            # Converte cada coluna para o tipo da tabela de destino (na tabela
+            # temporária colunas object são TEXT)
+            target_types = registry.table(conn, schema, table_name).columns
+            select_str = ', '.join(
+                _cast_expression(col, source_types.get(col), target_types.get(col)) for col in columns
+            )
+
+            # 5. Executar UPSERT
+            upsert_query = f"""
+            INSERT INTO {schema}.{table_name} ({columns_str})
+            SELECT {select_str} FROM {STAGING_SCHEMA}.{temp_table}
+            ON CONFLICT ("{primary_key}") 
+            DO UPDATE SET {update_str}
+            """
+        
+            conn.execute(text(upsert_query))
+            # A tabela temporária é removida no commit (ON COMMIT DROP)
+        
+            print(f"✅ Upsert concluído para {table_name}: {len(df)} registros processados")
+    except Exception:
+        # A transação pode ter desfeito DDL já refletido no cache
+        registry.invalidate(schema)
+        raise
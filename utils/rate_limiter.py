@@ -0,0 +1,164 @@
+"""
+Rate limiter (token bucket) compartilhado por processo para a API CartPanda.
+
+Todas as threads/corrotinas que usam a mesma API key dividem o mesmo balde,
+então o limite vale para a chave e não para cada thread. Respostas 429 com
+`Retry-After` pausam o balde inteiro até o horário indicado.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+# Limite padrão por API key (requisições por segundo) e rajada máxima.
+# A CartPanda não documenta um limite; o padrão reproduz o ritmo dos loaders
+# originais: 5 lojas em paralelo, cada uma com 1 s de pausa entre páginas
+# (~5 req/s; o loader de tickets do Movidesk, com 0,2 s entre tickets, também
+# ficava em ~5 req/s). Ajustável por `cartpanda_requests_per_second`.
+BASELINE_PARALLEL_SHOPS = 5
+BASELINE_PAGE_INTERVAL = 1.0
+DEFAULT_RATE = BASELINE_PARALLEL_SHOPS / BASELINE_PAGE_INTERVAL
+DEFAULT_BURST = BASELINE_PARALLEL_SHOPS
+
+# Pausa usada quando a API responde 429 sem Retry-After
+DEFAULT_RETRY_AFTER = 5.0
+
+# Janela usada para medir a taxa efetiva de requisições
+OBSERVED_RATE_WINDOW = 60.0
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """
+    Converte o header Retry-After (segundos ou data HTTP) em segundos de espera
+    """
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(retry_at.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe. `acquire()` bloqueia a thread e `acquire_async()`
+    cede o event loop até haver token disponível.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._granted = deque()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def _reserve(self):
+        """
+        Reserva um token e retorna quantos segundos esperar antes de usá-lo.
+        O saldo pode ficar negativo: cada chamada entra na fila atrás das anteriores.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            wait = max(self._blocked_until - now, 0.0)
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+
+            granted_at = now + wait
+            self._granted.append(granted_at)
+            while self._granted and self._granted[0] < now - OBSERVED_RATE_WINDOW:
+                self._granted.popleft()
+
+            return wait
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after=None):
+        """
+        Registra um 429: pausa o balde inteiro por `retry_after` segundos e zera os tokens
+        """
+        pause = parse_retry_after(retry_after)
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + pause)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated_at = max(self._updated_at, now)
+        return pause
+
+    def set_rate(self, rate, burst=None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            if burst is not None:
+                self.burst = float(burst)
+
+    @property
+    def observed_rate(self):
+        """
+        Taxa efetiva (req/s) liberada na última janela de OBSERVED_RATE_WINDOW segundos
+        """
+        with self._lock:
+            now = time.monotonic()
+            recent = [t for t in self._granted if now - OBSERVED_RATE_WINDOW <= t <= now]
+            if len(recent) < 2:
+                return float(len(recent))
+            elapsed = max(recent[-1] - recent[0], 1e-9)
+            return (len(recent) - 1) / elapsed
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter_key(api_key):
+    # Não guarda a API key em texto puro no registro
+    return hashlib.sha256((api_key or '').encode()).hexdigest()
+
+
+def get_rate_limiter(api_key, rate=None, burst=None):
+    """
+    Retorna o limiter do processo para a API key, criando-o se necessário.
+    Passar `rate`/`burst` atualiza o limite de um limiter existente.
+    """
+    key = _limiter_key(api_key)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = TokenBucket(rate or DEFAULT_RATE, burst or DEFAULT_BURST)
+            _limiters[key] = limiter
+            return limiter
+
+    if rate is not None:
+        limiter.set_rate(rate, burst)
+    return limiter
+
+
+def get_rate_limiter_for_headers(headers, rate=None, burst=None):
+    """
+    Atalho para os loaders, que só têm os headers com `Authorization: Bearer <key>`
+    """
+    return get_rate_limiter((headers or {}).get('Authorization', ''), rate, burst)
@@ -0,0 +1,41 @@
+"""
+Hash de conteúdo por linha, estável entre execuções e entre lotes.
+
+Usado para não reenviar ao PostgreSQL linhas que não mudaram: o transformer
+grava o hash numa coluna (`content_hash`) e o upsert compara com o hash já
+armazenado antes de montar a tabela temporária.
+
+O hash é calculado sobre os valores brutos extraídos (antes da conversão de
+tipos), serializados linha a linha em JSON numa lista fixa de colunas: não
+depende do dtype que a coluna recebeu no lote nem de quais colunas o lote tem.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+HASH_COLUMN = 'content_hash'
+
+
+def _canonical(value):
+    """Valor serializável e independente do lote (NaN → null, numpy → Python)"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def content_hash(columns, column_order, length):
+    """
+    Hash (int64, numpy) de cada linha de {coluna: valores} sobre as colunas de
+    `column_order`, nessa ordem; colunas ausentes entram como nulo
+    """
+    present = [columns.get(col) for col in column_order]
+    rows = [
+        json.dumps([None if values is None else _canonical(values[index]) for values in present],
+                   sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        for index in range(length)
+    ]
+    hashes = pd.util.hash_pandas_object(pd.Series(rows, dtype=object), index=False).to_numpy()
+    return hashes.view('int64')
@@ -0,0 +1,104 @@
+"""
+Cache do layout das tabelas de destino (colunas, tipos e constraints de
+unicidade), por banco.
+
+Cada banco (Railway, VPS) tem um registro, compartilhado pelas engines com a
+mesma URL. Um schema é lido do information_schema de uma vez (duas consultas
+para todas as tabelas) e fica em memória entre os upserts e entre execuções no
+mesmo processo. É relido quando:
+
+- o próprio código altera a estrutura (CREATE/ALTER TABLE): `invalidate`
+- uma tabela ou coluna esperada não está no cache (mudança feita por fora)
+- um upsert falha (a transação pode ter desfeito DDL já refletido no cache)
+"""
+from sqlalchemy import text
+
+_registries = {}
+
+
+class TableLayout:
+
+    def __init__(self):
+        self.columns = {}  # {coluna: data_type}, na ordem da tabela
+        self.unique_columns = set()  # colunas em PRIMARY KEY ou UNIQUE
+        self.has_primary_key = False
+
+
+class SchemaRegistry:
+    """
+    Uso:
+
+        registry = schema_registry(engine)
+        with engine.begin() as conn:
+            layout = registry.table(conn, 'integracao', 'cartpanda_orders', df.columns)
+            if layout is None:
+                ...  # tabela não existe
+            ...
+            registry.invalidate('integracao')  # depois de DDL
+    """
+
+    def __init__(self):
+        self._schemas = {}
+        # (schema, tabela, coluna) cuja conversão de TEXT falhou: não é tentada de novo
+        self.failed_migrations = set()
+
+    def refresh(self, conn, schema):
+        """Lê (de novo) o layout de todas as tabelas de `schema`"""
+        tables = {}
+        rows = conn.execute(text("""
+            SELECT table_name, column_name, data_type FROM information_schema.columns
+            WHERE table_schema = :schema
+            ORDER BY table_name, ordinal_position
+        """), {'schema': schema})
+        for table_name, column_name, data_type in rows.fetchall():
+            tables.setdefault(table_name, TableLayout()).columns[column_name] = data_type
+
+        rows = conn.execute(text("""
+            SELECT tc.table_name, tc.constraint_type, kcu.column_name
+            FROM information_schema.table_constraints tc
+            JOIN information_schema.key_column_usage kcu
+            ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+            WHERE tc.table_schema = :schema
+            AND tc.constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+        """), {'schema': schema})
+        for table_name, constraint_type, column_name in rows.fetchall():
+            layout = tables.get(table_name)
+            if layout is None:
+                continue
+            layout.unique_columns.add(column_name)
+            layout.has_primary_key |= constraint_type == 'PRIMARY KEY'
+
+        self._schemas[schema] = tables
+        return tables
+
+    def table(self, conn, schema, table_name, columns=()):
+        """
+        Layout da tabela, ou None se ela não existe. Relê o schema (uma vez)
+        se a tabela ou alguma das `columns` não está no cache.
+        """
+        tables = self._schemas.get(schema)
+        refreshed = tables is None
+        if refreshed:
+            tables = self.refresh(conn, schema)
+
+        layout = tables.get(table_name)
+        stale = layout is None or any(col not in layout.columns for col in columns)
+        if stale and not refreshed:
+            layout = self.refresh(conn, schema).get(table_name)
+        return layout
+
+    def invalidate(self, schema=None):
+        """Descarta o cache de `schema` (ou de todos)"""
+        if schema is None:
+            self._schemas.clear()
+        else:
+            self._schemas.pop(schema, None)
+
+
+def schema_registry(engine):
+    """Registro do banco de `engine` (um por URL)"""
+    key = engine.url.render_as_string(hide_password=True)
+    registry = _registries.get(key)
+    if registry is None:
+        registry = _registries[key] = SchemaRegistry()
+    return registry
@@ -0,0 +1,59 @@
+"""
+Registro das lojas CartPanda a partir de `cartpanda_shops.yaml` (raiz do projeto).
+
+Substitui as listas de slugs fixas em cada data loader: incluir uma loja nova é
+só uma linha no arquivo de configuração.
+"""
+import os
+
+import yaml
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHOPS_CONFIG_PATH = os.getenv(
+    'CARTPANDA_SHOPS_CONFIG', os.path.join(PROJECT_ROOT, 'cartpanda_shops.yaml')
+)
+
+
+def load_shops(path=SHOPS_CONFIG_PATH):
+    """
+    Lista de lojas ({'slug', 'endpoints', 'active'}) do arquivo de configuração
+    """
+    with open(path, encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+
+    shops = []
+    for entry in config.get('shops') or []:
+        if isinstance(entry, str):
+            entry = {'slug': entry}
+        if not entry.get('slug'):
+            raise ValueError(f"Loja sem slug em {path}: {entry}")
+        shops.append({
+            'slug': entry['slug'],
+            'endpoints': entry.get('endpoints'),
+            'active': entry.get('active', True),
+        })
+    return shops
+
+
+def load_shop_slugs(endpoint, path=SHOPS_CONFIG_PATH):
+    """
+    Slugs ativos para um endpoint ('orders', 'customers'), na ordem do arquivo
+    """
+    return [
+        shop['slug'] for shop in load_shops(path)
+        if shop['active'] and (shop['endpoints'] is None or endpoint in shop['endpoints'])
+    ]
+
+
+def shop_slugs_from_kwargs(kwargs, endpoint):
+    """
+    Slugs do bloco: variável `slugs` (lista ou texto separado por vírgulas), se
+    informada; senão o registro em `cartpanda_shops_config` ou no caminho padrão
+    """
+    slugs = kwargs.get('slugs')
+    if slugs:
+        if isinstance(slugs, str):
+            slugs = [slug.strip() for slug in slugs.split(',') if slug.strip()]
+        return list(slugs)
+
+    return load_shop_slugs(endpoint, kwargs.get('cartpanda_shops_config', SHOPS_CONFIG_PATH))
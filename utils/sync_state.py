@@ -0,0 +1,97 @@
+"""
+Estado de sincronização incremental (high-water mark) persistido no PostgreSQL.
+
+Guarda, por fonte (ex.: 'cartpanda_orders') e chave (ex.: slug da loja), o maior
+`updated_at` já exportado com sucesso. A próxima execução busca a partir desse
+valor menos uma janela de sobreposição.
+"""
+from datetime import timedelta
+
+import pandas as pd
+import pytz
+from sqlalchemy import text
+
+from utils.postgres import create_replication_engine
+
+STATE_SCHEMA = 'integracao'
+STATE_TABLE = 'sync_state'
+
+# Janela de sobreposição padrão para não perder registros atualizados durante a execução anterior
+DEFAULT_OVERLAP_MINUTES = 10
+
+API_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+
+def create_state_engine():
+    """
+    O estado fica no banco de REPLICAÇÃO/DEV (VPS): é o destino cuja falha
+    interrompe o pipeline, então o high-water mark nunca avança além de um
+    export que não foi concluído.
+    """
+    return create_replication_engine()
+
+
+def ensure_state_table(conn):
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {STATE_SCHEMA}"))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_SCHEMA}.{STATE_TABLE} (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            high_water_mark TIMESTAMPTZ NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (source, key)
+        )
+    """))
+
+
+def load_high_water_marks(engine, source):
+    """
+    Retorna {key: datetime UTC} com os high-water marks salvos para a fonte
+    """
+    with engine.begin() as conn:
+        ensure_state_table(conn)
+        rows = conn.execute(
+            text(f"SELECT key, high_water_mark FROM {STATE_SCHEMA}.{STATE_TABLE} WHERE source = :source"),
+            {'source': source},
+        ).fetchall()
+
+    return {key: pd.Timestamp(mark).tz_convert('UTC').to_pydatetime() for key, mark in rows}
+
+
+def save_high_water_marks(engine, source, marks):
+    """
+    Grava os high-water marks ({key: datetime}). Nunca retrocede um valor já salvo.
+    """
+    if not marks:
+        return
+
+    with engine.begin() as conn:
+        ensure_state_table(conn)
+        for key, mark in marks.items():
+            conn.execute(text(f"""
+                INSERT INTO {STATE_SCHEMA}.{STATE_TABLE} (source, key, high_water_mark, updated_at)
+                VALUES (:source, :key, :mark, now())
+                ON CONFLICT (source, key) DO UPDATE SET
+                    high_water_mark = GREATEST({STATE_TABLE}.high_water_mark, EXCLUDED.high_water_mark),
+                    updated_at = now()
+            """), {'source': source, 'key': key, 'mark': mark})
+
+
+def compute_high_water_marks(df, key_column, timestamp_column):
+    """
+    Calcula o maior timestamp por chave (ex.: maior updated_at por shop_slug) de um DataFrame
+    """
+    if df is None or df.empty or key_column not in df.columns or timestamp_column not in df.columns:
+        return {}
+
+    timestamps = pd.to_datetime(df[timestamp_column], utc=True, errors='coerce', format='ISO8601')
+    maxima = timestamps.groupby(df[key_column]).max().dropna()
+    return {key: mark.to_pydatetime() for key, mark in maxima.items()}
+
+
+def to_api_timestamp(mark, overlap_minutes=DEFAULT_OVERLAP_MINUTES):
+    """
+    Converte o high-water mark no formato de `updated_at_min` da API, já descontando a sobreposição
+    """
+    since = mark.astimezone(pytz.UTC) - timedelta(minutes=overlap_minutes)
+    return since.strftime(API_TIMESTAMP_FORMAT)